@@ -13,6 +13,7 @@
 #
 #    * Change all non-exposed functions and variables to "static" in
 #      both headers (extern -> static) and in implementation files.
+#      FIXME: not implemented yet, declarations are emitted as is.
 #
 #    * Emit internal headers by starting from duk_internal.h (the only
 #      internal header included by Duktape C files) and emulating the
@@ -43,141 +44,250 @@
 #    * External includes are not removed or combined: some of them are
 #      inside #ifdef directives, so it would difficult to do so.  Ideally
 #      there would be no external includes in individual files.
+#
+#  Usage:
+#
+#    python combine_src.py [--num-outputs=N] <srcdir> <output.c> [<stampfile>]
+#
+#  If a stamp file is given, a hash of the input files (and this script)
+#  is recorded in it.  When the hash matches on a later run and the output
+#  files exist, the combine step is skipped and the outputs are only touched.
+#
+#  With --num-outputs=N (N > 1) the result is split into N translation
+#  units which share a combined header containing the internal headers,
+#  so that the combined sources can be compiled in parallel.
+
+from __future__ import print_function
 
 import os
-import sys
 import re
+import hashlib
+import optparse
+import multiprocessing.pool
+
+# Source lines are kept as byte strings throughout; the output is written
+# out byte-for-byte without going through a text codec.
+re_include = re.compile(br'^#include.*$', re.MULTILINE)
+re_extinc = re.compile(br'^#include <(.*?)>.*$')
+re_intinc = re.compile(br'^#include \"(duk.*?)\".*$')  # accept duktape.h too
 
-re_extinc = re.compile(r'^#include <(.*?)>.*$')
-re_intinc = re.compile(r'^#include \"(duk.*?)\".*$')  # accept duktape.h too
+# Internal includes which are kept as is instead of being expanded
+keep_includes = frozenset([ b'duktape.h', b'duk_custom.h' ])
 
 class File:
 	filename_full = None
 	filename = None
+	data = None
 	lines = None
+	includes = None		# map of lineno -> (is_internal, include name)
+	line_suffix = None	# pre-formatted filename part of a #line directive
 
-	def __init__(self, filename, lines):
+	def __init__(self, filename, data, lines):
 		self.filename = os.path.basename(filename)
 		self.filename_full = filename
+		self.data = data
 		self.lines = lines
+		self.line_suffix = b' "' + self.filename.encode('ascii') + b'"\n'
 
-class Line:
-	filename_full = None
-	filename = None
-	lineno = None
-	data = None
+# Lines refer to their File instead of carrying a copy of the filename;
+# there are a lot of Line objects so keep them slotted.
+class Line(object):
+	__slots__ = ('file', 'lineno', 'data')
 
-	def __init__(self, filename, lineno, data):
-		self.filename = os.path.basename(filename)
-		self.filename_full = filename
+	def __init__(self, file, lineno, data):
+		self.file = file
 		self.lineno = lineno
 		self.data = data
 
 def read(filename):
-	lines = []
-
-	f = None
+	# Read the whole file with a single read() and split it into lines
+	# afterwards; most input files are small headers so per-line reads
+	# would be dominated by call overhead.
+	fd = os.open(filename, os.O_RDONLY)
 	try:
-		f = open(filename, 'rb')
-		lineno = 0
-		for line in f:
-			lineno += 1
-			if len(line) > 0 and line[-1] == '\n':
-				line = line[:-1]
-			lines.append(Line(filename, lineno, line))
+		size = os.fstat(fd).st_size
+		parts = []
+		while size > 0:
+			t = os.read(fd, size)
+			if len(t) == 0:
+				break
+			parts.append(t)
+			size -= len(t)
+		data = b''.join(parts)
 	finally:
-		if f is not None:
-			f.close()
-
-	return File(filename, lines)
-
-def findFile(files, filename):
-	for i in files:
-		if i.filename == filename:
-			return i
-	return None
-
-def processIncludes(f):
-	extinc = []
-	intinc = []
-
-	for line in f.lines:
-		if not line.data.startswith('#include'):
-			continue
-
-		m = re_extinc.match(line.data)
-		if m is not None:
-			# external includes are kept; they may even be conditional
-			extinc.append(m.group(1))
-			#line.data = ''
+		os.close(fd)
+
+	tmp = data.split(b'\n')
+	if tmp[-1] == b'':
+		tmp.pop()  # trailing newline, or empty file
+	f = File(filename, data, None)
+	f.lines = [ Line(f, i + 1, x) for i, x in enumerate(tmp) ]
+	f.includes = scanIncludes(data)
+
+	return f
+
+def scanIncludes(data):
+	# Locate #include lines with a single regex scan over the whole file
+	# and classify them once; later passes just look up line numbers.
+	res = {}
+
+	lineno = 1
+	pos = 0
+	for m in re_include.finditer(data):
+		lineno += data.count(b'\n', pos, m.start())
+		pos = m.start()
+		t = m.group(0)
+
+		m2 = re_extinc.match(t)
+		if m2 is not None:
+			res[lineno] = (False, m2.group(1))
 			continue
 
-		m = re_intinc.match(line.data)
-		if m is not None:
-			intinc.append(m.group(1))
-			#line.data = ''
+		m2 = re_intinc.match(t)
+		if m2 is not None:
+			res[lineno] = (True, m2.group(1))
 			continue
 
-		print(line.data)
+		print(t)
 		raise Exception('cannot parse include directive')
 
-	return extinc, intinc
+	return res
+
+def listSourceFiles(dirname):
+	# Sorted list of .c and .h file paths in a directory; the sort keeps
+	# the output deterministic.
+	if hasattr(os, 'scandir'):
+		# Python 3.5+: scandir() provides names and paths without extra
+		# string operations per file.
+		res = [ (e.name, e.path) for e in os.scandir(dirname) if e.name.endswith(('.c', '.h')) ]
+	else:
+		res = [ (fn, os.path.join(dirname, fn)) for fn in os.listdir(dirname) if fn.endswith(('.c', '.h')) ]
+	res.sort()
+	return [ path for name, path in res ]
+
+def computeInputHash(files):
+	# Hash everything affecting the output: input filenames and contents,
+	# and the combine script itself.
+	h = hashlib.sha1()
+
+	script = os.path.abspath(__file__)
+	if script.endswith('.pyc') or script.endswith('.pyo'):
+		script = script[:-1]
+	f = open(script, 'rb')
+	h.update(f.read())
+	f.close()
 
-def processDeclarations(f):
-	for line in f.lines:
-		# FIXME: total placeholder
-		if line.data.startswith('int ') or line.data.startswith('void '):
-			line.data = 'static ' + line.data
-		elif line.data.startswith('extern int') or line.data.startswith('extern void '):
-			line.data = 'static ' + line.data[7:]  # replace extern with static
+	for f in files:
+		h.update(b'%s\x00%d\x00' % (f.filename.encode('ascii'), len(f.data)))
+		h.update(f.data)
 
-def createCombined(files, extinc, intinc):
-	res = []
+	return h.hexdigest()
 
-	emit_state = [ None, None ]  # curr_filename, curr_lineno
+def readStamp(filename):
+	if not os.path.exists(filename):
+		return None
+	f = open(filename, 'rb')
+	res = f.read().strip()
+	f.close()
+	return res.decode('ascii')
 
-	def emit(line):
-		if isinstance(line, (str, unicode)):
-			res.append(line)
-			emit_state[1] += 1
-		else:
-			if line.filename != emit_state[0] or line.lineno != emit_state[1]:
-				res.append('#line %d "%s"' % (line.lineno, line.filename))
-			res.append(line.data)
-			emit_state[0] = line.filename
-			emit_state[1] = line.lineno + 1
+def writeStamp(filename, key):
+	f = open(filename, 'wb')
+	f.write(key.encode('ascii') + b'\n')
+	f.close()
 
-	processed = {}
+def processIncludes(f):
+	extinc = []
+	intinc = []
 
-	# Helper to process internal headers recursively, starting from duk_internal.h
-	def processHeader(f_hdr):
-		#print('Process header: ' + f_hdr.filename)
-		for line in f_hdr.lines:
-			m = re_intinc.match(line.data)
-			if m is None:
-				emit(line)
-				continue
-			incname = m.group(1)
-			if incname in [ 'duktape.h', 'duk_custom.h' ]:
-				# keep a few special headers as is
-				emit(line)
-				continue
+	for lineno in sorted(f.includes.keys()):
+		is_internal, incname = f.includes[lineno]
+		if is_internal:
+			intinc.append(incname)
+		else:
+			# external includes are kept; they may even be conditional
+			extinc.append(incname)
 
-			#print('Include: ' + incname)
-			f_inc = findFile(files, incname)
-			assert(f_inc)
+	return extinc, intinc
 
-			if processed.has_key(f_inc.filename):
-				#print('already included, skip: ' + f_inc.filename)
-				emit('/* already included: %s */' % f_inc.filename)
-				continue
-			processed[f_inc.filename] = True
+def createEmitter(out):
+	# Returns (emit, emitText) functions writing to the 'out' file object.
+	# Output is streamed as it is generated so that the combined source is
+	# never held in memory as a whole.
+	write = out.write
+
+	# File and line number the C preprocessor assumes for the next output
+	# line.  A #line directive is only emitted when a non-blank line would
+	# otherwise be attributed incorrectly: blank lines cannot produce
+	# diagnostics, so a resync can wait until the next line with content.
+	# This avoids directives for e.g. a single blank line between two
+	# included headers.
+	emit_state = [ None, 0 ]  # curr_file, curr_lineno
+
+	# Emit a source line.  This is called for every line so keep it lean:
+	# one state check for the common in-sync case and locally bound
+	# callables (default arguments are locals inside the function).
+	def emit(line, write=write, state=emit_state):
+		lineno = line.lineno
+		if line.file is not state[0] or lineno != state[1]:
+			if line.data.strip() != b'':
+				write(b'#line ' + str(lineno).encode('ascii') + line.file.line_suffix)
+				state[0] = line.file
+				state[1] = lineno
+		write(line.data + b'\n')
+		state[1] += 1
+
+	# Emit a generated line (e.g. a comment replacing an include directive).
+	def emitText(text):
+		write(text + b'\n')
+		emit_state[1] += 1
+
+	return emit, emitText
+
+def emitHeaders(files, files_by_name, emit, emitText):
+	# Emit internal headers by starting from duk_internal.h and expanding
+	# includes in place.  Returns the set of filenames which have been
+	# dealt with: all headers are considered processed afterwards.
 
-			# include file in this place, recursively
-			processHeader(f_inc)
+	processed = {}
+
+	# Includes are expanded using an explicit stack of partially consumed
+	# line iterators rather than recursion.
+	def processHeader(f_hdr):
+		stack = [ (iter(f_hdr.lines), f_hdr.includes.get) ]
+		while len(stack) > 0:
+			lines, get_include = stack[-1]
+			for line in lines:
+				inc = get_include(line.lineno)
+				if inc is None or not inc[0]:
+					emit(line)
+					continue
+				incname = inc[1]
+				if incname in keep_includes:
+					# keep a few special headers as is
+					emit(line)
+					continue
+
+				#print('Include: ' + incname)
+				f_inc = files_by_name.get(incname.decode('ascii'))
+				assert(f_inc)
+
+				if f_inc.filename in processed:
+					#print('already included, skip: ' + f_inc.filename)
+					emitText(b'/* already included: %s */' % f_inc.filename.encode('ascii'))
+					continue
+				processed[f_inc.filename] = True
+
+				# include file in this place; the current file continues
+				# from the next line once the included file is done
+				#print('Process header: ' + f_inc.filename)
+				stack.append((iter(f_inc.lines), f_inc.includes.get))
+				break
+			else:
+				stack.pop()
 
 	# Process internal headers by starting with duk_internal.h
-	f_dukint = findFile(files, 'duk_internal.h')
+	f_dukint = files_by_name.get('duk_internal.h')
 	assert(f_dukint)
 	processHeader(f_dukint)
 
@@ -187,66 +297,139 @@ def createCombined(files, extinc, intinc):
 			continue
 		processed[f.filename] = True
 
-	# Then emit remaining files
-	for f in files:
-		if processed.has_key(f.filename):
-			continue
+	return processed
 
+def emitSources(files, emit, emitText):
+	# Emit source files as is, removing internal includes
+	for f in files:
+		get_include = f.includes.get
 		for line in f.lines:
-			m = re_intinc.match(line.data)
-			if m is None:
+			inc = get_include(line.lineno)
+			if inc is None or not inc[0]:
 				emit(line)
 			else:
-				incname = m.group(1)
-				emit('/* include removed: %s */' % incname)
-
-	return '\n'.join(res) + '\n'
+				emitText(b'/* include removed: %s */' % inc[1])
+
+def createCombined(files, files_by_name, extinc, intinc, out):
+	# Single output: internal headers followed by all remaining files.
+	emit, emitText = createEmitter(out)
+	processed = emitHeaders(files, files_by_name, emit, emitText)
+	emitSources([ f for f in files if f.filename not in processed ], emit, emitText)
+
+def createSplit(files, files_by_name, extinc, intinc, out_hdr, hdr_name, outs):
+	# Multiple outputs: internal headers are combined into a shared header
+	# and the remaining files are distributed round-robin into the output
+	# files, each including the shared header.  The outputs are separate
+	# translation units which can be compiled in parallel; since nothing
+	# is converted to static, they link together like the separate sources.
+	emit, emitText = createEmitter(out_hdr)
+	processed = emitHeaders(files, files_by_name, emit, emitText)
+	sources = [ f for f in files if f.filename not in processed ]
+
+	for i, out in enumerate(outs):
+		emit, emitText = createEmitter(out)
+		emitText(b'#include "%s"' % hdr_name.encode('ascii'))
+		emitSources(sources[i::len(outs)], emit, emitText)
 
 def main():
-	outname = sys.argv[2]
+	parser = optparse.OptionParser(usage='%prog [options] <srcdir> <output.c> [<stampfile>]')
+	parser.add_option('--num-outputs', dest='num_outputs', type='int', default=1,
+	                  help='split the sources into this many output files')
+	(opts, args) = parser.parse_args()
+	if len(args) < 2 or opts.num_outputs < 1:
+		parser.error('invalid arguments')
+
+	srcdir = args[0]
+	outname = args[1]
 	assert(outname)
+	stampname = None
+	if len(args) > 2:
+		stampname = args[2]
+
+	# With multiple outputs, <output.c> names a base: e.g. duktape.c results
+	# in duktape_combined.h and duktape_0.c ... duktape_<N-1>.c.
+	outbase, outext = os.path.splitext(outname)
+	if opts.num_outputs > 1:
+		hdrname = outbase + '_combined.h'
+		splitnames = [ '%s_%d%s' % (outbase, i, outext) for i in range(opts.num_outputs) ]
+		outnames = [ hdrname ] + splitnames
+	else:
+		outnames = [ outname ]
+
+	print('Read input files')
+	filenames = listSourceFiles(srcdir)
+
+	# Reads are independent so overlap them with a thread pool; map()
+	# keeps the sorted order.
+	pool = multiprocessing.pool.ThreadPool(max(1, min(32, len(filenames))))
+	try:
+		files = pool.map(read, filenames)
+	finally:
+		pool.close()
+		pool.join()
+	print('%d files read' % len(files))
+
+	input_hash = None
+	if stampname is not None:
+		input_hash = computeInputHash(files) + ' %d' % opts.num_outputs
+		outputs_exist = True
+		for fn in outnames:
+			if not os.path.exists(fn):
+				outputs_exist = False
+		if outputs_exist and readStamp(stampname) == input_hash:
+			print('Inputs unchanged, keeping %s' % ', '.join(outnames))
+			for fn in outnames:
+				os.utime(fn, None)
+			return
+
+	# filename -> File lookup for include processing
+	files_by_name = {}
+	for f in files:
+		files_by_name[f.filename] = f
 
-	print 'Read input files'
-	files = []
-	filelist = os.listdir(sys.argv[1])
-	filelist.sort()  # for consistency
-	for fn in filelist:
-		if os.path.splitext(fn)[1] not in [ '.c', '.h' ]:
-			continue
-		res = read(os.path.join(sys.argv[1], fn))
-		files.append(res)
-	print '%d files read' % len(files)
-
-	print 'Process #include statements'
+	print('Process #include statements')
 	extinc = []
 	intinc = []
+	extinc_seen = set()
+	intinc_seen = set()
 	for f in files:
 		extnew, intnew = processIncludes(f)
 		for i in extnew:
-			if i in extinc:
+			if i in extinc_seen:
 				continue
+			extinc_seen.add(i)
 			extinc.append(i)
 		for i in intnew:
-			if i in intinc:
+			if i in intinc_seen:
 				continue
+			intinc_seen.add(i)
 			intinc.append(i)
 
 	#print('external includes: ' + ', '.join(extinc))
 	#print('internal includes: ' + ', '.join(intinc))
 
-	print 'Process declarations (non-exposed are converted to static)'
-	for f in files:
-		#processDeclarations(f)
-		pass
+	print('Output final file')
+	# Large output buffers: the combined source is a few megabytes and
+	# is written in small per-line pieces.
+	outfiles = []
+	try:
+		for fn in outnames:
+			outfiles.append(open(fn, 'wb', 1 << 20))
+		if opts.num_outputs > 1:
+			createSplit(files, files_by_name, extinc, intinc, outfiles[0],
+			            os.path.basename(hdrname), outfiles[1:])
+		else:
+			createCombined(files, files_by_name, extinc, intinc, outfiles[0])
+		outsizes = [ f.tell() for f in outfiles ]
+	finally:
+		for f in outfiles:
+			f.close()
 
-	print 'Output final file'
-	final = createCombined(files, extinc, intinc)
-	f = open(outname, 'wb')
-	f.write(final)
-	f.close()
+	if stampname is not None:
+		writeStamp(stampname, input_hash)
 
-	print 'Wrote %d bytes to %s' % (len(final), outname)
+	for fn, size in zip(outnames, outsizes):
+		print('Wrote %d bytes to %s' % (size, fn))
 
 if __name__ == '__main__':
 	main()
-
@@ -23,6 +23,10 @@ DIST=`pwd`/dist
 DISTSRCSEP=$DIST/src-separate
 DISTSRCCOM=$DIST/src
 
+# Interpreter for genbuiltins.py, which runs on Python 2, Python 3 and PyPy.
+# For example: PYTHON_GENBUILTINS=pypy sh make_dist.sh
+PYTHON_GENBUILTINS=${PYTHON_GENBUILTINS:-python}
+
 # FIXME
 if [ -d .git ]; then
 	BUILDINFO="`date +%Y-%m-%d`; `uname -a`; `git rev-parse HEAD`"
@@ -232,7 +236,7 @@ python src/genbuildparams.py \
 	--out-json=$DISTSRCSEP/buildparams.json.tmp \
 	--out-header=$DISTSRCSEP/duk_buildparams.h.tmp
 
-python src/genbuiltins.py \
+$PYTHON_GENBUILTINS src/genbuiltins.py \
 	--buildinfo=$DISTSRCSEP/buildparams.json.tmp \
 	--out-header=$DISTSRCSEP/duk_builtins.h \
 	--out-source=$DISTSRCSEP/duk_builtins.c \
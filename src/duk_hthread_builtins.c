@@ -7,27 +7,28 @@
 #include "duk_internal.h"
 
 /*
- *  Encoding constants, must match genbuiltins.py
+ *  Encoding constants, must match genbuiltins.py.  Index and count field
+ *  widths depend on the data and come from the generated duk_builtins.h.
  */
 
 #define CLASS_BITS                  5
-#define BIDX_BITS                   6
-#define STRIDX_BITS                 9  /* FIXME: try to optimize to 8 */
-#define NATIDX_BITS                 8
-#define NUM_NORMAL_PROPS_BITS       6
-#define NUM_FUNC_PROPS_BITS         6
+#define BIDX_BITS                   DUK_BUILTINS_BIDX_BITS
+#define BIDX_SHORT_BITS             DUK_BUILTINS_BIDX_SHORT_BITS
+#define STRIDX_BITS                 DUK_BUILTINS_STRIDX_BITS
+#define NATIDX_BITS                 DUK_BUILTINS_NATIDX_BITS
+#define NUM_NORMAL_PROPS_BITS       DUK_BUILTINS_NUM_NORMAL_PROPS_BITS
+#define NUM_FUNC_PROPS_BITS         DUK_BUILTINS_NUM_FUNC_PROPS_BITS
+#define DOUBLE_IDX_BITS             DUK_BUILTINS_DOUBLE_IDX_BITS
 #define PROP_FLAGS_BITS             3
 #define STRING_LENGTH_BITS          8
 #define STRING_CHAR_BITS            7
 #define LENGTH_PROP_BITS            3
+#define LENGTH_PROP_SHORT_BITS      1
 #define NARGS_BITS                  3
 #define PROP_TYPE_BITS              3
 #define MAGIC_BITS                  16
 
-#define NARGS_VARARGS_MARKER        0x07
 #define NO_CLASS_MARKER             0x00   /* 0 = DUK_HOBJECT_CLASS_UNUSED */
-#define NO_BIDX_MARKER              0x3f
-#define NO_STRIDX_MARKER            0xff
 
 #define PROP_TYPE_DOUBLE            0
 #define PROP_TYPE_STRING            1
@@ -38,6 +39,36 @@
 #define PROP_TYPE_BOOLEAN_FALSE     6
 #define PROP_TYPE_ACCESSOR          7
 
+/*
+ *  Decode a built-in index: a flag bit followed by either a short index
+ *  (for the most referenced built-ins, which genbuiltins.py places first)
+ *  or a full index.
+ */
+
+static int duk_hthread_decode_bidx(duk_bitdecoder_ctx *bd) {
+	if (duk_bd_decode_flag(bd)) {
+		return (int) duk_bd_decode(bd, BIDX_BITS);
+	} else {
+		return (int) duk_bd_decode(bd, BIDX_SHORT_BITS);
+	}
+}
+
+/*
+ *  Decode nargs of a native function: a flag bit for the default value
+ *  (the 'length' of the function), then a flag bit distinguishing varargs
+ *  from an explicit nargs value.
+ */
+
+static int duk_hthread_decode_nargs(duk_bitdecoder_ctx *bd, int def_value) {
+	if (!duk_bd_decode_flag(bd)) {
+		return def_value;
+	}
+	if (!duk_bd_decode_flag(bd)) {
+		return DUK_VARARGS;
+	}
+	return (int) duk_bd_decode(bd, NARGS_BITS);
+}
+
 /*
  *  Create built-in objects by parsing an init bitstream generated
  *  by genbuiltins.py.
@@ -90,10 +121,7 @@ void duk_hthread_create_builtin_objects(duk_hthread *thr) {
 			stridx = duk_bd_decode(bd, STRIDX_BITS);
 			c_func = duk_builtin_native_functions[natidx];
 
-			c_nargs = duk_bd_decode_flagged(bd, NARGS_BITS, len /*def_value*/);
-			if (c_nargs == NARGS_VARARGS_MARKER) {
-				c_nargs = DUK_VARARGS;
-			}
+			c_nargs = duk_hthread_decode_nargs(bd, len /*def_value*/);
 
 			/* FIXME: set magic directly here? (it could share the c_nargs arg) */
 			duk_push_c_function(ctx, c_func, c_nargs);
@@ -205,14 +233,14 @@ void duk_hthread_create_builtin_objects(duk_hthread *thr) {
 		DUK_DDDPRINT("initializing built-in object at index %d", i);
 		h = thr->builtins[i];
 
-		t = duk_bd_decode(bd, BIDX_BITS);
-		if (t != NO_BIDX_MARKER) {
+		if (duk_bd_decode_flag(bd)) {
+			t = duk_hthread_decode_bidx(bd);
 			DUK_DDDPRINT("set internal prototype: built-in %d", (int) t);
 			DUK_HOBJECT_SET_PROTOTYPE(thr, h, thr->builtins[t]);
 		}
 
-		t = duk_bd_decode(bd, BIDX_BITS);
-		if (t != NO_BIDX_MARKER) {
+		if (duk_bd_decode_flag(bd)) {
+			t = duk_hthread_decode_bidx(bd);
 			/* 'prototype' property for all built-in objects (which have it) has attributes:
 			 *  [[Writable]] = false,
 			 *  [[Enumerable]] = false,
@@ -222,8 +250,8 @@ void duk_hthread_create_builtin_objects(duk_hthread *thr) {
 			duk_def_prop_stridx_builtin(ctx, i, DUK_STRIDX_PROTOTYPE, t, DUK_PROPDESC_FLAGS_NONE);
 		}
 
-		t = duk_bd_decode(bd, BIDX_BITS);
-		if (t != NO_BIDX_MARKER) {
+		if (duk_bd_decode_flag(bd)) {
+			t = duk_hthread_decode_bidx(bd);
 			/* 'constructor' property for all built-in objects (which have it) has attributes:
 			 *  [[Writable]] = true,
 			 *  [[Enumerable]] = false,	
@@ -269,11 +297,19 @@ void duk_hthread_create_builtin_objects(duk_hthread *thr) {
 				duk_double_union du;
 				int k;
 
-				for (k = 0; k < 8; k++) {
-					/* Encoding endianness must match target memory layout,
-					 * build scripts and genbuiltins.py must ensure this.
-					 */
-					du.uc[k] = (duk_uint8_t) duk_bd_decode(bd, 8);
+				if (duk_bd_decode_flag(bd)) {
+					/* Shared double, stored as high/low 32-bit words. */
+					k = duk_bd_decode(bd, DOUBLE_IDX_BITS);
+					DUK_ASSERT(k >= 0 && k < DUK_BUILTINS_NUM_DOUBLES);
+					DUK_DBLUNION_SET_HIGH32(&du, duk_builtins_doubles[2 * k]);
+					DUK_DBLUNION_SET_LOW32(&du, duk_builtins_doubles[2 * k + 1]);
+				} else {
+					for (k = 0; k < 8; k++) {
+						/* Encoding endianness must match target memory layout,
+						 * build scripts and genbuiltins.py must ensure this.
+						 */
+						du.uc[k] = (duk_uint8_t) duk_bd_decode(bd, 8);
+					}
 				}
 
 				duk_push_number(ctx, du.d);  /* push operation normalizes NaNs */
@@ -304,8 +340,8 @@ void duk_hthread_create_builtin_objects(duk_hthread *thr) {
 			case PROP_TYPE_BUILTIN: {
 				int bidx;
 
-				bidx = duk_bd_decode(bd, BIDX_BITS);
-				DUK_ASSERT(bidx != NO_BIDX_MARKER);
+				bidx = duk_hthread_decode_bidx(bd);
+				DUK_ASSERT(bidx >= 0 && bidx < DUK_NUM_BUILTINS);
 				duk_dup(ctx, bidx);
 				break;
 			}
@@ -378,10 +414,28 @@ void duk_hthread_create_builtin_objects(duk_hthread *thr) {
 			stridx = duk_bd_decode(bd, STRIDX_BITS);
 			natidx = duk_bd_decode(bd, NATIDX_BITS);
 
-			c_length = duk_bd_decode(bd, LENGTH_PROP_BITS);
-			c_nargs = duk_bd_decode_flagged(bd, NARGS_BITS, (duk_int32_t) c_length /*def_value*/);
-			if (c_nargs == NARGS_VARARGS_MARKER) {
-				c_nargs = DUK_VARARGS;
+			if (duk_bd_decode_flag(bd)) {
+				c_length = duk_bd_decode(bd, LENGTH_PROP_BITS);
+			} else {
+				c_length = duk_bd_decode(bd, LENGTH_PROP_SHORT_BITS);
+			}
+
+			/* A simple method has default nargs and no magic.  Otherwise
+			 * nargs follows, and the magic value follows either directly
+			 * (default nargs) or as a flagged field.
+			 */
+			magic = 0;
+			if (duk_bd_decode_flag(bd)) {
+				if (duk_bd_decode_flag(bd)) {
+					c_nargs = (duk_bd_decode_flag(bd) ? (int) duk_bd_decode(bd, NARGS_BITS) : DUK_VARARGS);
+					/* Cast converts magic to 16-bit signed value */
+					magic = (duk_int16_t) duk_bd_decode_flagged(bd, MAGIC_BITS, 0);
+				} else {
+					c_nargs = c_length;
+					magic = (duk_int16_t) duk_bd_decode(bd, MAGIC_BITS);
+				}
+			} else {
+				c_nargs = c_length;
 			}
 
 			c_func = duk_builtin_native_functions[natidx];
@@ -403,11 +457,6 @@ void duk_hthread_create_builtin_objects(duk_hthread *thr) {
 			 */
 			DUK_HOBJECT_SET_STRICT((duk_hobject *) h_func);
 
-			/* FIXME: any way to avoid decoding magic bit; there are quite
-			 * many function properties and relatively few with magic values.
-			 */
-			/* Cast converts magic to 16-bit signed value */
-			magic = (duk_int16_t) duk_bd_decode_flagged(bd, MAGIC_BITS, 0);
 			h_func->magic = magic;
 
 			/* [ (builtin objects) func ] */
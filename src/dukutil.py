@@ -3,104 +3,219 @@
 #  Python utilities shared by the build scripts.
 #
 
+from __future__ import print_function
+
+import os
+import struct
 import datetime
 import json
 
-class BitEncoder:
+try:
+	_text_type = unicode
+except NameError:
+	_text_type = str  # Python 3
+
+_u64 = struct.Struct('>Q')
+
+class BitEncoder(object):
 	"Bitstream encoder."
 
-	_bits = None
+	# Complete bytes are flushed into a bytearray; at most 7 pending bits
+	# are kept in a small integer accumulator.  This keeps the cost of
+	# bits() proportional to the number of output bytes rather than the
+	# number of bits, and avoids one list element per bit.  Callers which
+	# emit a lot of fields should collect them with BitFieldList and pack
+	# them with a single fields() call.
+
+	__slots__ = ('_buf', '_acc', '_nacc')
 
 	def __init__(self):
-		self._bits = []
+		self._buf = bytearray()
+		self._acc = 0
+		self._nacc = 0
 
 	def bits(self, x, nbits):
 		if (x >> nbits) != 0:
 			raise Exception('input value has too many bits (value: %d, bits: %d)' % (x, nbits))
-		for i in xrange(nbits):
-			t = (x >> (nbits - i - 1)) & 0x01
-			self._bits.append(t)
+		if nbits == 8 and self._nacc == 0:
+			# byte aligned, no need to go through the accumulator
+			self._buf.append(x)
+			return
+		acc = (self._acc << nbits) | x
+		n = self._nacc + nbits
+		while n >= 8:
+			n -= 8
+			self._buf.append((acc >> n) & 0xff)
+		self._acc = acc & ((1 << n) - 1)
+		self._nacc = n
 
 	def string(self, x):
-		nbits = len(x) * 8
-
-		for i in xrange(nbits):
-			byteidx = i / 8
-			bitidx = i % 8
-			if byteidx < 0 or byteidx >= len(x):
-				self._bits.append(0)
-			else:
-				t = (ord(x[byteidx]) >> (7 - bitidx)) & 0x01
-				self._bits.append(t)
+		if self._nacc == 0:
+			self._buf.extend(bytearray(x))
+			return
+
+		# Unaligned: shift the data in through 64-bit windows rather
+		# than one byte at a time.
+		x = bytearray(x)
+		n = len(x)
+		i = 0
+		while i + 8 <= n:
+			self.bits(_u64.unpack_from(x, i)[0], 64)
+			i += 8
+		for t in x[i:]:
+			self.bits(t, 8)
+
+	def chars(self, x, nbits):
+		"Encode each byte of a string as an nbits wide field."
+
+		# Same as calling bits() per byte, but with the encoder state
+		# kept in locals for the whole string.
+		buf = self._buf
+		acc = self._acc
+		n = self._nacc
+		limit = 1 << nbits
+		for t in bytearray(x):
+			if t >= limit:
+				raise Exception('input value has too many bits (value: %d, bits: %d)' % (t, nbits))
+			acc = (acc << nbits) | t
+			n += nbits
+			while n >= 8:
+				n -= 8
+				buf.append((acc >> n) & 0xff)
+			acc &= (1 << n) - 1
+		self._acc = acc
+		self._nacc = n
+
+	def fields(self, pairs):
+		"Encode a sequence of (value, nbits) pairs."
+
+		# The total size is known up front, so grow the buffer once and
+		# then fill it in by index.
+		if not isinstance(pairs, list):
+			pairs = list(pairs)
+		buf = self._buf
+		acc = self._acc
+		n = self._nacc
+		i = len(buf)
+		buf.extend(bytearray((n + sum([ nbits for _, nbits in pairs ])) >> 3))
+		for x, nbits in pairs:
+			if (x >> nbits) != 0:
+				raise Exception('input value has too many bits (value: %d, bits: %d)' % (x, nbits))
+			acc = (acc << nbits) | x
+			n += nbits
+			while n >= 8:
+				n -= 8
+				buf[i] = (acc >> n) & 0xff
+				i += 1
+			acc &= (1 << n) - 1
+		self._acc = acc
+		self._nacc = n
 
 	def getNumBits(self):
 		"Get current number of encoded bits."
-		return len(self._bits)
+		return len(self._buf) * 8 + self._nacc
 
 	def getNumBytes(self):
 		"Get current number of encoded bytes, rounded up."
-		nbits = len(self._bits)
-		while (nbits % 8) != 0:
-			nbits += 1
-		return nbits / 8
+		return len(self._buf) + (1 if self._nacc > 0 else 0)
 
 	def getBytes(self):
 		"Get current bitstream as a byte sequence, padded with zero bits."
-		bytes = []
-
-		for i in xrange(self.getNumBytes()):
-			t = 0
-			for j in xrange(8):
-				off = i*8 + j
-				if off >= len(self._bits):
-					t = (t << 1)
-				else:
-					t = (t << 1) + self._bits[off]
-			bytes.append(t)
-
-		return bytes
+		res = list(self._buf)
+		if self._nacc > 0:
+			res.append((self._acc << (8 - self._nacc)) & 0xff)
+		return res
 
 	def getByteString(self):
 		"Get current bitstream as a string."
-		return ''.join([chr(i) for i in self.getBytes()])
+		return bytes(bytearray(self.getBytes()))
+
+class BitFieldList(object):
+	"Record bit fields as (value, nbits) pairs for BitEncoder.fields()."
+
+	# Has the same emit interface as BitEncoder, so that a generator can
+	# first produce the whole field sequence and then pack it in a single
+	# tight loop.
+
+	__slots__ = ('pairs', 'placeholders')
+
+	def __init__(self):
+		self.pairs = []
+		self.placeholders = []
+
+	def bits(self, x, nbits):
+		self.pairs.append((x, nbits))
+
+	def string(self, x):
+		self.pairs.extend([ (t, 8) for t in bytearray(x) ])
+
+	def chars(self, x, nbits):
+		self.pairs.extend([ (t, nbits) for t in bytearray(x) ])
+
+	def placeholder(self, key):
+		"Reserve a field which is filled in later by resolve()."
+		self.placeholders.append((len(self.pairs), key))
+		self.pairs.append(None)
+
+	def extend(self, other):
+		"Append the fields (and placeholders) of another BitFieldList."
+		offset = len(self.pairs)
+		self.placeholders.extend([ (idx + offset, key) for idx, key in other.placeholders ])
+		self.pairs.extend(other.pairs)
+
+	def resolve(self, func):
+		"Get the pairs with each placeholder replaced by the pair func(key)."
+		pairs = list(self.pairs)
+		for idx, key in self.placeholders:
+			pairs[idx] = func(key)
+		return pairs
+
+# Formatted integer array items for all byte values, see GenerateC.emitArray().
+_int_array_items = [ '%d,' % i for i in range(256) ]
 
 class GenerateC:
 	"Helper for generating C source and header files."
 
-	_data = None
+	_buf = None
+	_append = None
 	wrap_col = 76
 
 	def __init__(self):
-		self._data = []
+		# Output is collected UTF-8 encoded into a bytearray.
+		self._buf = bytearray()
+		self._append = lambda text: self._buf.extend(text.encode('utf-8'))
 
 	def emitRaw(self, text):
 		"Emit raw text (without automatic newline)."
-		self._data.append(text)
+		self._append(text)
 
 	def emitLine(self, text):
 		"Emit a raw line (with automatic newline)."
-		self._data.append(text + '\n')
+		self._append(text + '\n')
+
+	def emitLines(self, lines):
+		"Emit a sequence of raw lines (with automatic newlines)."
+		lines = list(lines)
+		if len(lines) > 0:
+			self._append('\n'.join(lines) + '\n')
 
 	def emitHeader(self, autogen_by):
 		"Emit file header comments."
 
 		# Note: a timestamp would be nice but it breaks incremental building
-		self.emitLine('/*')
-		self.emitLine(' *  Automatically generated by %s, do not edit!' % autogen_by)
-		self.emitLine(' */')
-		self.emitLine('')
+		self.emitRaw('/*\n'
+		             ' *  Automatically generated by %s, do not edit!\n'
+		             ' */\n'
+		             '\n' % autogen_by)
 
 	def emitArray(self, data, tablename, typename='char', bytesize=None, intvalues=False, const=True):
 		"Emit an array as a C array."
 
 		# lenient input
-		if isinstance(data, unicode):
+		if isinstance(data, _text_type):
 			data = data.encode('utf-8')
-		if isinstance(data, str):
-			tmp = []
-			for i in xrange(len(data)):
-				tmp.append(ord(data[i]))
-			data = tmp
+		if isinstance(data, bytes):
+			data = bytearray(data)
 
 		size_spec = ''
 		if bytesize is not None:
@@ -108,35 +223,92 @@ class GenerateC:
 		const_qual = ''
 		if const:
 			const_qual = 'const '
-		self.emitLine('%s%s %s[%s] = {' % (const_qual, typename, tablename, size_spec))
+		lines = [ '%s%s %s[%s] = {' % (const_qual, typename, tablename, size_spec) ]
 
-		line = ''
-		for i in xrange(len(data)):
+		# Format all items first and then cut them into lines by tracking
+		# the line length, instead of growing a line string per item.  The
+		# whole array is emitted as a single chunk.
+		if intvalues:
+			fmt = '%d,'
+		else:
+			fmt = "(" + typename + ")'\\x%02x', "
+		if isinstance(data, bytearray):
+			# Byte data: format each possible byte value once and look
+			# the items up from the table.
 			if intvalues:
-				t = "%d," % data[i]
+				table = _int_array_items
 			else:
-				t = "(%s)'\\x%02x', " % (typename, data[i])
-			if len(line) + len(t) >= self.wrap_col:
-				self.emitLine(line)
-				line = t
-			else:
-				line += t
-		if line != '':
-			self.emitLine(line)
-		self.emitLine('};')
-
-	def emitDefine(self, name, value, comment=None):
-		"Emit a C define with an optional comment."
+				table = [ fmt % i for i in range(256) ]
+			items = list(map(table.__getitem__, data))
+		else:
+			items = list(map(fmt.__mod__, data))
+		wrap_col = self.wrap_col
+		start = 0
+		linelen = 0
+		for i, t in enumerate(items):
+			if linelen + len(t) >= wrap_col:
+				lines.append(''.join(items[start:i]))
+				start = i
+				linelen = 0
+			linelen += len(t)
+		if start < len(items):
+			lines.append(''.join(items[start:]))
+		lines.append('};')
+		self.emitLines(lines)
+
+	def formatDefine(self, name, value, comment=None):
+		"Format a C define with an optional comment, without a newline."
 
 		# XXX: there is no escaping right now (for comment or value)
 		if comment is not None:
-			self.emitLine('#define %-60s  %-30s /* %s */' % (name, value, comment))
+			return '#define %-60s  %-30s /* %s */' % (name, value, comment)
 		else:
-			self.emitLine('#define %-60s  %s' % (name, value))
+			return '#define %-60s  %s' % (name, value)
+
+	def emitDefine(self, name, value, comment=None):
+		"Emit a C define with an optional comment."
+		self.emitLine(self.formatDefine(name, value, comment))
+
+	def getBytes(self):
+		"Get the entire file as UTF-8 encoded bytes."
+		return bytes(self._buf)
 
 	def getString(self):
 		"Get the entire file as a string."
-		return ''.join(self._data)
+		return self.getBytes().decode('utf-8')
+
+	def writeTo(self, f):
+		"Write the entire file into a file opened in binary mode."
+		f.write(self._buf)
+
+try:
+	_replace_file = os.replace
+except AttributeError:
+	_replace_file = os.rename  # Python 2, replaces an existing file on POSIX
+
+def write_file_if_changed(filename, data):
+	"Write data (bytes) to a file unless the file already has identical content."
+
+	assert(isinstance(data, bytes))
+
+	# Leaving an unchanged file alone keeps its timestamp, so that e.g.
+	# make does not rebuild everything depending on it.
+	if os.path.exists(filename):
+		f = open(filename, 'rb')
+		old = f.read()
+		f.close()
+		if old == data:
+			return False
+
+	# Write under a temporary name and rename into place once complete, so
+	# that a concurrent reader or an interrupted run never sees a partially
+	# written file.  There is no fsync(): the files can always be regenerated.
+	tmpname = '%s.%d.tmp' % (filename, os.getpid())
+	f = open(tmpname, 'wb')
+	f.write(data)
+	f.close()
+	_replace_file(tmpname, filename)
+	return True
 
 def json_encode(x):
 	"JSON encode a value."
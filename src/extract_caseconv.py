@@ -144,14 +144,14 @@ def remove_ascii_part(convmap):
 	"Remove ASCII case conversion parts (handled by C fast path)."
 
 	for i in xrange(128):
-		if convmap.has_key(i):
+		if i in convmap:
 			del convmap[i]
 
 def scan_range_with_skip(convmap, start_idx, skip):
 	"Scan for a range of continuous case conversion with a certain 'skip'."
 
 	conv_i = start_idx
-	if not convmap.has_key(conv_i):
+	if conv_i not in convmap:
 		return None, None, None
 	elif len(convmap[conv_i]) > 1:
 		return None, None, None
@@ -165,7 +165,7 @@ def scan_range_with_skip(convmap, start_idx, skip):
 		new_i = conv_i + skip
 		new_o = conv_o + skip
 
-		if not convmap.has_key(new_i):
+		if new_i not in convmap:
 			break
 		if len(convmap[new_i]) > 1:
 			break
@@ -381,7 +381,7 @@ def main():
 	genc.emitArray(uc_bytes, opts.table_name_uc, bytesize=len(uc_bytes), typename='duk_uint8_t', intvalues=True, const=True)
 	genc.emitArray(lc_bytes, opts.table_name_lc, bytesize=len(lc_bytes), typename='duk_uint8_t', intvalues=True, const=True)
 	f = open(opts.out_source, 'wb')
-	f.write(genc.getString())
+	genc.writeTo(f)
 	f.close()
 
 	genc = dukutil.GenerateC()
@@ -389,7 +389,7 @@ def main():
 	genc.emitLine('extern const duk_uint8_t %s[%d];' % (opts.table_name_uc, len(uc_bytes)))
 	genc.emitLine('extern const duk_uint8_t %s[%d];' % (opts.table_name_lc, len(lc_bytes)))
 	f = open(opts.out_header, 'wb')
-	f.write(genc.getString())
+	genc.writeTo(f)
 	f.close()
 
 if __name__ == '__main__':
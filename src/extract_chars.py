@@ -101,7 +101,7 @@ def generate_png(lines, fname):
 		y = cp / width
 		x = cp % width
 
-		if m.has_key(long(cp)):
+		if long(cp) in m:
 			im.putpixel((x,y), black)
 		else:
 			im.putpixel((x,y), white)
@@ -334,7 +334,7 @@ def main():
 	genc.emitArray(matchtable3, opts.table_name, bytesize=len(matchtable3), typename='duk_uint8_t', intvalues=True, const=True)
 	if opts.out_source is not None:
 		f = open(opts.out_source, 'wb')
-		f.write(genc.getString())
+		genc.writeTo(f)
 		f.close()
 
 	genc = dukutil.GenerateC()
@@ -342,7 +342,7 @@ def main():
 	genc.emitLine('extern const duk_uint8_t %s[%d];' % (opts.table_name, len(matchtable3)))
 	if opts.out_header is not None:
 		f = open(opts.out_header, 'wb')
-		f.write(genc.getString())
+		genc.writeTo(f)
 		f.close()
 
 	# Image (for illustrative purposes only)
@@ -22,18 +22,24 @@ if __name__ == '__main__':
 
 	t = { 'version': opts.version, 'build': opts.build }
 
-	f = open(opts.out_json, 'wb')
-	f.write(dukutil.json_encode(t).encode('ascii'))
-	f.close()
+	# Only (re)write outputs whose content changes so that a rerun with the
+	# same version and build info doesn't trigger downstream rebuilds.
+	dukutil.write_file_if_changed(opts.out_json, dukutil.json_encode(t).encode('ascii'))
 
-	f = open(opts.out_header, 'wb')
-	f.write('#ifndef DUK_BUILDPARAMS_H_INCLUDED\n')
-	f.write('#define DUK_BUILDPARAMS_H_INCLUDED\n')
-	f.write('/* automatically generated by genbuildparams.py, do not edit */\n')
-	f.write('\n')
-	f.write('/* DUK_VERSION is defined in duktape.h */')
-	f.write('#define DUK_BUILD       "%s"\n' % opts.build)
-	f.write('\n')
-	f.write('#endif  /* DUK_BUILDPARAMS_H_INCLUDED */\n')
-	f.close()
+	# The build string includes e.g. 'uname -a' output and may contain
+	# non-ASCII characters, so the header is assembled as bytes with the
+	# build string encoded explicitly.
+	build = opts.build
+	if not isinstance(build, bytes):
+		build = build.encode('utf-8', 'surrogateescape')  # Python 3: arguments are text
 
+	hdr = []
+	hdr.append(b'#ifndef DUK_BUILDPARAMS_H_INCLUDED\n')
+	hdr.append(b'#define DUK_BUILDPARAMS_H_INCLUDED\n')
+	hdr.append(b'/* automatically generated by genbuildparams.py, do not edit */\n')
+	hdr.append(b'\n')
+	hdr.append(b'/* DUK_VERSION is defined in duktape.h */')
+	hdr.append(b'#define DUK_BUILD       "' + build + b'"\n')
+	hdr.append(b'\n')
+	hdr.append(b'#endif  /* DUK_BUILDPARAMS_H_INCLUDED */\n')
+	dukutil.write_file_if_changed(opts.out_header, b''.join(hdr))
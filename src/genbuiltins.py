@@ -16,13 +16,20 @@
 #    - Built-in objects are represented by their built-in index
 #
 #    - Native functions are represented by indexing the built-in
-#      native function array
+#      native function array; the C function names only appear in
+#      that array and never in the init data, so there is no native
+#      name string pool to compress
 #
 #  Other notes:
 #
 #    - 'values' and 'functions' are intentionally ordered, so that the
 #      initialization order (and hence enumeration order) of keys can be
 #      controlled.
+#
+#    - The script must run on a stock Python 2 or 3 interpreter, without
+#      compiled extension modules (e.g. Cython), because make_dist.sh runs
+#      it directly.  A full run takes about a tenth of a second, most of
+#      which is interpreter startup.
 
 # FIXME: Some algorithms need to refer to the original, unmodified built-in
 # functions (like Object.toString).  These should be marked somehow here and
@@ -31,12 +38,15 @@
 # FIXME: Builtins are now introduced as variables.  They should be built on
 # the fly if profile specific built-in data needs to be supported.
 
+from __future__ import print_function
+
 import os
 import sys
 import json
 import math
 import struct
 import optparse
+import itertools
 import copy
 
 import dukutil
@@ -46,8 +56,9 @@ import genstrings
 #  Helpers and constants
 #
 #  Double constants, see http://en.wikipedia.org/wiki/Double-precision_floating-point_format.
-#  Some double constants have been created with 'python-mpmath'.  The constants are in binary
-#  so that the package is not needed for a normal build.
+#  Some double constants have been created with 'python-mpmath'.  The constants are given as
+#  exact hex float literals so that the package is not needed for a normal build.  Only the
+#  NaN needs a specific bit pattern and is created from its binary representation.
 #
 
 def create_double_constants_mpmath():
@@ -58,10 +69,9 @@ def create_double_constants_mpmath():
 	mpmath.mp.prec = 1000  # 1000 bits
 
 	def printhex(name, x):
-		# to hex string, ready for create_double()
-		hex = struct.pack('>d', float(str(x))).encode('hex')
-		flt = struct.unpack('>d', hex.decode('hex'))[0]
-		print '%s -> %s  (= %.20f)' % (name, hex, flt)
+		# to hex float literal, ready for float.fromhex()
+		flt = float(str(x))
+		print('%s -> %s  (= %.20f)' % (name, flt.hex(), flt))
 
 	printhex('DBL_E', mpmath.mpf(mpmath.e))
 	printhex('DBL_LN10', mpmath.log(10))
@@ -74,22 +84,49 @@ def create_double_constants_mpmath():
 
 #create_double_constants_mpmath()
 
+try:
+	_text_type = unicode
+except NameError:
+	_text_type = str  # Python 3
+
+_dbl_big = struct.Struct('>d')
+_dbl_little = struct.Struct('<d')
+_u64_big = struct.Struct('>Q')
+
+# encoding of double must match target architecture byte order; the value
+# is packed once and the other byte orders are derived by byte swapping
+def packDoubleByteOrders(x):
+	data = _dbl_little.pack(x)
+	return {
+		'big': data[::-1],			# 01234567
+		'little': data,				# 76543210
+		'middle': data[4:8] + data[0:4]		# 32107654 (arm)
+	}
+
+_byte_orders = [ 'little', 'big', 'middle' ]
+
 def create_double(x):
-	return struct.unpack('>d', x.decode('hex'))[0]
-
-DBL_NAN =                    create_double('7ff8000000000000')  # a NaN matching our "normalized NAN" definition (see duk_tval.h)
-DBL_POSITIVE_INFINITY =      create_double('7ff0000000000000')  # positive infinity (unique)
-DBL_NEGATIVE_INFINITY =      create_double('fff0000000000000')  # negative infinity (unique)
-DBL_MAX_DOUBLE =             create_double('7fefffffffffffff')  # 'Max Double'
-DBL_MIN_DOUBLE =             create_double('0000000000000001')  # 'Min subnormal positive double'
-DBL_E =                      create_double('4005bf0a8b145769')  # (= 2.71828182845904509080)
-DBL_LN10 =                   create_double('40026bb1bbb55516')  # (= 2.30258509299404590109)
-DBL_LN2 =                    create_double('3fe62e42fefa39ef')  # (= 0.69314718055994528623)
-DBL_LOG2E =                  create_double('3ff71547652b82fe')  # (= 1.44269504088896338700)
-DBL_LOG10E =                 create_double('3fdbcb7b1526e50e')  # (= 0.43429448190325181667)
-DBL_PI =                     create_double('400921fb54442d18')  # (= 3.14159265358979311600)
-DBL_SQRT1_2 =                create_double('3fe6a09e667f3bcd')  # (= 0.70710678118654757274)
-DBL_SQRT2 =                  create_double('3ff6a09e667f3bcd')  # (= 1.41421356237309514547)
+	# x is the IEEE double bit pattern as an integer
+	return _dbl_big.unpack(_u64_big.pack(x))[0]
+
+def double_bits(x):
+	# inverse of create_double(); unlike the float itself, the bit
+	# pattern distinguishes -0.0 from 0.0 and compares equal for NaNs
+	return _u64_big.unpack(_dbl_big.pack(x))[0]
+
+DBL_NAN =                    create_double(0x7ff8000000000000)  # a NaN matching our "normalized NAN" definition (see duk_tval.h)
+DBL_POSITIVE_INFINITY =      float('inf')                       # positive infinity (unique)
+DBL_NEGATIVE_INFINITY =      float('-inf')                      # negative infinity (unique)
+DBL_MAX_DOUBLE =             float.fromhex('0x1.fffffffffffffp+1023')  # 'Max Double'
+DBL_MIN_DOUBLE =             float.fromhex('0x0.0000000000001p-1022')  # 'Min subnormal positive double'
+DBL_E =                      float.fromhex('0x1.5bf0a8b145769p+1')     # (= 2.71828182845904509080)
+DBL_LN10 =                   float.fromhex('0x1.26bb1bbb55516p+1')     # (= 2.30258509299404590109)
+DBL_LN2 =                    float.fromhex('0x1.62e42fefa39efp-1')     # (= 0.69314718055994528623)
+DBL_LOG2E =                  float.fromhex('0x1.71547652b82fep+0')     # (= 1.44269504088896338700)
+DBL_LOG10E =                 float.fromhex('0x1.bcb7b1526e50ep-2')     # (= 0.43429448190325181667)
+DBL_PI =                     float.fromhex('0x1.921fb54442d18p+1')     # (= 3.14159265358979311600)
+DBL_SQRT1_2 =                float.fromhex('0x1.6a09e667f3bcdp-1')     # (= 0.70710678118654757274)
+DBL_SQRT2 =                  float.fromhex('0x1.6a09e667f3bcdp+0')     # (= 1.41421356237309514547)
 
 # marker for 'undefined' value
 UNDEFINED = {}
@@ -98,25 +135,19 @@ UNDEFINED = {}
 LENGTH_PROPERTY_ATTRIBUTES = ""
 DEFAULT_PROPERTY_ATTRIBUTES = "wc"
 
-# encoding constants (must match duk_hthread_builtins.c)
+# encoding constants (must match duk_hthread_builtins.c); the widths of
+# index and count fields are computed from the data, see computeBitWidths()
 CLASS_BITS = 5
-BIDX_BITS = 6
-STRIDX_BITS = 9   # FIXME: try to optimize to 8
-NATIDX_BITS = 8
-NUM_NORMAL_PROPS_BITS = 6
-NUM_FUNC_PROPS_BITS = 6
 PROP_FLAGS_BITS = 3
 STRING_LENGTH_BITS = 8
 STRING_CHAR_BITS = 7
 LENGTH_PROP_BITS = 3
+LENGTH_PROP_SHORT_BITS = 1
 NARGS_BITS = 3
 PROP_TYPE_BITS = 3
 MAGIC_BITS = 16
 
-NARGS_VARARGS_MARKER = 0x07
 NO_CLASS_MARKER = 0x00   # 0 = DUK_HOBJECT_CLASS_UNUSED 
-NO_BIDX_MARKER = 0x3f
-NO_STRIDX_MARKER = 0xff
 
 PROP_TYPE_DOUBLE = 0
 PROP_TYPE_STRING = 1
@@ -133,6 +164,20 @@ PROPDESC_FLAG_ENUMERABLE =   (1 << 1)
 PROPDESC_FLAG_CONFIGURABLE = (1 << 2)
 PROPDESC_FLAG_ACCESSOR =     (1 << 3)  # unused now
 
+# Property attribute string -> PROPDESC_FLAG_XXX bits.  Keys are in sorted
+# character order (e.g. "cw" for "wc"), so the 8 subsets of the attribute
+# characters cover every valid attribute string.  The accessor flag is not
+# included: it doesn't fit PROP_FLAGS_BITS and is set by C code instead.
+_property_flag_chars = {
+	'w': PROPDESC_FLAG_WRITABLE,
+	'e': PROPDESC_FLAG_ENUMERABLE,
+	'c': PROPDESC_FLAG_CONFIGURABLE
+}
+_property_flags = {}
+for _n in range(len(_property_flag_chars) + 1):
+	for _t in itertools.combinations(sorted(_property_flag_chars.keys()), _n):
+		_property_flags[''.join(_t)] = sum([ _property_flag_chars[c] for c in _t ])
+
 # magic values for Date built-in, must match duk_builtin_date.c
 BI_DATE_FLAG_NAN_TO_ZERO =        (1 << 0)
 BI_DATE_FLAG_NAN_TO_RANGE_ERROR = (1 << 1)
@@ -201,17 +246,14 @@ _classnames = [
 	'Pointer',
 	'Thread',
 ]
-_class2num = {}
-for i,v in enumerate(_classnames):
-	_class2num[v] = i
+_class2num = dict((v, i) for i, v in enumerate(_classnames))
 
-def classToNumber(x):
-	return _class2num[x]
+# class name -> class number, a bound lookup avoids a wrapper call per use
+classToNumber = _class2num.__getitem__
 
-def internal(x):
-	# zero-prefix is used to mark internal values in genstrings.py;
-	# it is converted to \xFF during initialization
-	return '\x00' + x
+# Internal property names use the same (interned) form as the string
+# table in genstrings.py, so they are always encoded as string indexes.
+internal = genstrings.internal_name
 
 #
 #  Built-in object descriptions
@@ -738,9 +780,9 @@ bi_regexp_prototype = {
 		{
 			# Compiled bytecode, must match duk_regexp.h.
 			'name': internal('bytecode'),
-			'value': unichr(0) +		# flags (none)
-			         unichr(2) +		# nsaved == 2
-			         unichr(1),		# DUK_REOP_MATCH
+			'value': chr(0) +		# flags (none)
+			         chr(2) +		# nsaved == 2
+			         chr(1),		# DUK_REOP_MATCH
 			'attributes': '',
 		},
 		{
@@ -850,173 +892,56 @@ bi_error_prototype = {
 # do not have a 'message' property at all.  Also, in V8 their 'name' property
 # is not writable and configurable as E5 requires.
 
-bi_eval_error_constructor = {
-	'internal_prototype': 'bi_function_prototype',
-	'external_prototype': 'bi_eval_error_prototype',
-	'class': 'Function',
-	'name': 'EvalError',
-
-	'length': 1,
-	'native': 'duk_builtin_error_constructor_shared',
-	'callable': True,
-	'constructable': True,
-	'magic': { 'type': 'bidx', 'value': 'bi_eval_error_prototype' },
-
-	'values': [],
-	'functions': [],
-}
-
-bi_eval_error_prototype = {
-	'internal_prototype': 'bi_error_prototype',
-	'external_constructor': 'bi_eval_error_constructor',
-	'class': 'Error',
-
-	'values': [
-		{ 'name': 'name',			'value': 'EvalError' },
-		{ 'name': 'message',			'value': '' },
-	],
-	'functions': [],
-}
-
-bi_range_error_constructor = {
-	'internal_prototype': 'bi_function_prototype',
-	'external_prototype': 'bi_range_error_prototype',
-	'class': 'Function',
-	'name': 'RangeError',
-
-	'length': 1,
-	'native': 'duk_builtin_error_constructor_shared',
-	'callable': True,
-	'constructable': True,
-	'magic': { 'type': 'bidx', 'value': 'bi_range_error_prototype' },
-
-	'values': [],
-	'functions': [],
-}
-
-bi_range_error_prototype = {
-	'internal_prototype': 'bi_error_prototype',
-	'external_constructor': 'bi_range_error_constructor',
-	'class': 'Error',
-
-	'values': [
-		{ 'name': 'name',			'value': 'RangeError' },
-		{ 'name': 'message',			'value': '' },
-	],
-	'functions': [],
-}
-
-bi_reference_error_constructor = {
-	'internal_prototype': 'bi_function_prototype',
-	'external_prototype': 'bi_reference_error_prototype',
-	'class': 'Function',
-	'name': 'ReferenceError',
-
-	'length': 1,
-	'native': 'duk_builtin_error_constructor_shared',
-	'callable': True,
-	'constructable': True,
-	'magic': { 'type': 'bidx', 'value': 'bi_reference_error_prototype' },
-
-	'values': [],
-	'functions': [],
-}
-
-bi_reference_error_prototype = {
-	'internal_prototype': 'bi_error_prototype',
-	'external_constructor': 'bi_reference_error_constructor',
-	'class': 'Error',
-
-	'values': [
-		{ 'name': 'name',			'value': 'ReferenceError' },
-		{ 'name': 'message',			'value': '' },
-	],
-	'functions': [],
-}
-
-bi_syntax_error_constructor = {
-	'internal_prototype': 'bi_function_prototype',
-	'external_prototype': 'bi_syntax_error_prototype',
-	'class': 'Function',
-	'name': 'SyntaxError',
-
-	'length': 1,
-	'native': 'duk_builtin_error_constructor_shared',
-	'callable': True,
-	'constructable': True,
-	'magic': { 'type': 'bidx', 'value': 'bi_syntax_error_prototype' },
-
-	'values': [],
-	'functions': [],
-}
-
-bi_syntax_error_prototype = {
-	'internal_prototype': 'bi_error_prototype',
-	'external_constructor': 'bi_syntax_error_constructor',
-	'class': 'Error',
-
-	'values': [
-		{ 'name': 'name',			'value': 'SyntaxError' },
-		{ 'name': 'message',			'value': '' },
-	],
-	'functions': [],
-}
-
-bi_type_error_constructor = {
-	'internal_prototype': 'bi_function_prototype',
-	'external_prototype': 'bi_type_error_prototype',
-	'class': 'Function',
-	'name': 'TypeError',
-
-	'length': 1,
-	'native': 'duk_builtin_error_constructor_shared',
-	'callable': True,
-	'constructable': True,
-	'magic': { 'type': 'bidx', 'value': 'bi_type_error_prototype' },
-
-	'values': [],
-	'functions': [],
-}
-
-bi_type_error_prototype = {
-	'internal_prototype': 'bi_error_prototype',
-	'external_constructor': 'bi_type_error_constructor',
-	'class': 'Error',
-
-	'values': [
-		{ 'name': 'name',			'value': 'TypeError' },
-		{ 'name': 'message',			'value': '' },
-	],
-	'functions': [],
-}
-
-bi_uri_error_constructor = {
-	'internal_prototype': 'bi_function_prototype',
-	'external_prototype': 'bi_uri_error_prototype',
-	'class': 'Function',
-	'name': 'URIError',
-
-	'length': 1,
-	'native': 'duk_builtin_error_constructor_shared',
-	'callable': True,
-	'constructable': True,
-	'magic': { 'type': 'bidx', 'value': 'bi_uri_error_prototype' },
-
-	'values': [],
-	'functions': [],
-}
-
-bi_uri_error_prototype = {
-	'internal_prototype': 'bi_error_prototype',
-	'external_constructor': 'bi_uri_error_constructor',
-	'class': 'Error',
-
-	'values': [
-		{ 'name': 'name',			'value': 'URIError' },
-		{ 'name': 'message',			'value': '' },
-	],
-	'functions': [],
-}
+# The native error constructors and prototypes only differ in their
+# names, so they are generated from templates.
+
+def nativeErrorConstructor(name, proto_id):
+	return {
+		'internal_prototype': 'bi_function_prototype',
+		'external_prototype': proto_id,
+		'class': 'Function',
+		'name': name,
+
+		'length': 1,
+		'native': 'duk_builtin_error_constructor_shared',
+		'callable': True,
+		'constructable': True,
+		'magic': { 'type': 'bidx', 'value': proto_id },
+
+		'values': [],
+		'functions': [],
+	}
+
+# The empty 'message' of the native error prototypes is shared by all of
+# them, and is converted into a single ValueProp record (see
+# internValueProp()).
+_EMPTY_MESSAGE = { 'name': 'message', 'value': '' }
+
+def nativeErrorPrototype(name, constructor_id):
+	return {
+		'internal_prototype': 'bi_error_prototype',
+		'external_constructor': constructor_id,
+		'class': 'Error',
+
+		'values': [
+			{ 'name': 'name',			'value': name },
+			_EMPTY_MESSAGE,
+		],
+		'functions': [],
+	}
+
+bi_eval_error_constructor = nativeErrorConstructor('EvalError', 'bi_eval_error_prototype')
+bi_eval_error_prototype = nativeErrorPrototype('EvalError', 'bi_eval_error_constructor')
+bi_range_error_constructor = nativeErrorConstructor('RangeError', 'bi_range_error_prototype')
+bi_range_error_prototype = nativeErrorPrototype('RangeError', 'bi_range_error_constructor')
+bi_reference_error_constructor = nativeErrorConstructor('ReferenceError', 'bi_reference_error_prototype')
+bi_reference_error_prototype = nativeErrorPrototype('ReferenceError', 'bi_reference_error_constructor')
+bi_syntax_error_constructor = nativeErrorConstructor('SyntaxError', 'bi_syntax_error_prototype')
+bi_syntax_error_prototype = nativeErrorPrototype('SyntaxError', 'bi_syntax_error_constructor')
+bi_type_error_constructor = nativeErrorConstructor('TypeError', 'bi_type_error_prototype')
+bi_type_error_prototype = nativeErrorPrototype('TypeError', 'bi_type_error_constructor')
+bi_uri_error_constructor = nativeErrorConstructor('URIError', 'bi_uri_error_prototype')
+bi_uri_error_prototype = nativeErrorPrototype('URIError', 'bi_uri_error_constructor')
 
 bi_math = {
 	'internal_prototype': 'bi_object_prototype',
@@ -1280,89 +1205,446 @@ builtins_orig = [
 	{ 'id': 'bi_double_error',                      'info': bi_double_error },
 ]
 
+# The descriptors repeat the same short strings (builtin ids, class names,
+# native function names) many times; intern them so that the copies share
+# a single object and hash only once.
+
+try:
+	_intern = sys.intern
+except AttributeError:
+	_intern = intern  # Python 2
+
+def internStrings(x):
+	if isinstance(x, dict):
+		for k in x.keys():
+			x[k] = internStrings(x[k])
+	elif isinstance(x, list):
+		for i in range(len(x)):
+			x[i] = internStrings(x[i])
+	elif isinstance(x, str):
+		return _intern(x)
+	return x
+
+internStrings(builtins_orig)
+
+# Property descriptors are written as dict literals above for readability.
+# They are converted into slotted records once at import: records are much
+# smaller than dicts, and optional fields become attributes with default
+# values instead of keys which may or may not be present.
+
+# descriptor flags (generator internal, not part of the init data)
+FLAG_VARARGS =       (1 << 0)
+FLAG_SECTION_B =     (1 << 1)
+FLAG_BROWSER =       (1 << 2)
+FLAG_CALLABLE =      (1 << 3)
+FLAG_CONSTRUCTABLE = (1 << 4)
+
+def descriptorFlags(varargs=False, section_b=False, browser=False, callable=False, constructable=False):
+	return (FLAG_VARARGS if varargs else 0) | \
+	       (FLAG_SECTION_B if section_b else 0) | \
+	       (FLAG_BROWSER if browser else 0) | \
+	       (FLAG_CALLABLE if callable else 0) | \
+	       (FLAG_CONSTRUCTABLE if constructable else 0)
+
+def classifyValue(val, getter, setter):
+	# Determine the PROP_TYPE_XXX of a property value.  Strings are always
+	# classified as PROP_TYPE_STRING; whether they can be encoded with a
+	# string index is only known when the strings have been processed.
+	if isinstance(val, bool):
+		if val == True:
+			return PROP_TYPE_BOOLEAN_TRUE
+		else:
+			return PROP_TYPE_BOOLEAN_FALSE
+	elif val == UNDEFINED:
+		return PROP_TYPE_UNDEFINED
+	elif isinstance(val, (float, int)):
+		return PROP_TYPE_DOUBLE
+	elif isinstance(val, (str, _text_type)):
+		return PROP_TYPE_STRING
+	elif isinstance(val, dict):
+		if val['type'] == 'builtin':
+			return PROP_TYPE_BUILTIN
+	elif val is None and getter is not None and setter is not None:
+		return PROP_TYPE_ACCESSOR
+	raise Exception('unsupported value: %s' % repr(val))
+
+class ValueProp(object):
+	"Normal (value or accessor) property descriptor."
+
+	__slots__ = ('name', 'value', 'attributes', 'default_attributes', 'getter', 'setter', 'flags', 'ptype')
+
+	def __init__(self, name, value=None, attributes=None, getter=None, setter=None, section_b=False, browser=False):
+		self.name = name
+		self.value = value		# None for accessors
+		self.attributes = attributes	# None: default attributes
+		if name == 'length':
+			self.default_attributes = LENGTH_PROPERTY_ATTRIBUTES
+		else:
+			self.default_attributes = DEFAULT_PROPERTY_ATTRIBUTES
+		self.getter = getter
+		self.setter = setter
+		self.flags = descriptorFlags(section_b=section_b, browser=browser)
+		self.ptype = classifyValue(value, getter, setter)
+
+class FunctionProp(object):
+	"Function property descriptor."
+
+	__slots__ = ('name', 'native', 'length', 'nargs', 'magic', 'flags')
+
+	def __init__(self, name, native, length, nargs=None, varargs=False, magic=None, section_b=False, browser=False):
+		self.name = name
+		self.native = native
+		self.length = length
+		self.nargs = nargs		# None: default nargs (= length)
+		self.magic = magic
+		self.flags = descriptorFlags(varargs=varargs, section_b=section_b, browser=browser)
+
+def packFunctionHeader(f):
+	# 'length' as a single (value, bit count) field.  Most functions have
+	# a 'length' of 0 or 1, which is encoded with a short field after a
+	# flag bit.
+	length = f.length
+	assert(length >= 0 and length < (1 << LENGTH_PROP_BITS))
+	if length < (1 << LENGTH_PROP_SHORT_BITS):
+		return length, 1 + LENGTH_PROP_SHORT_BITS  # flag: short length
+	else:
+		return (1 << LENGTH_PROP_BITS) | length, 1 + LENGTH_PROP_BITS  # flag: full length
+
+def packFunctionNargs(f):
+	# Non-default nargs as a single (value, bit count) field, None if
+	# nargs is the default (same as 'length').
+	nargs = f.nargs
+	if f.flags & FLAG_VARARGS:
+		return 2, 2  # flag: non-default nargs, flag: varargs
+	if nargs is None:
+		return None
+	assert(nargs >= 0 and nargs < (1 << NARGS_BITS))
+	return (3 << NARGS_BITS) | nargs, 2 + NARGS_BITS  # flag: non-default nargs, flag: explicit nargs
+
+# Identical function descriptors (same name, native, length etc) may occur
+# in several builtins; share a single canonical record for them.  The
+# records are not modified after normalization so sharing is safe.
+
+_function_pool = {}
+
+def internFunctionProp(f):
+	magic = f.magic
+	if magic is not None:
+		magic = tuple(sorted(magic.items()))
+	key = (f.name, f.native, f.length, f.nargs, magic, f.flags)
+	return _function_pool.setdefault(key, f)
+
+# Value descriptors shared by several builtins (the same dict object, such
+# as _EMPTY_MESSAGE) are converted only once.  The pool keeps a reference
+# to the descriptor so that its id() stays unique.
+
+_value_pool = {}
+
+def internValueProp(v):
+	t = _value_pool.get(id(v))
+	if t is None:
+		t = _value_pool[id(v)] = (v, ValueProp(**v))
+	return t[1]
+
+class BuiltinInfo(object):
+	"Built-in object descriptor."
+
+	# The function property emitter only needs a handful of fields from
+	# each function descriptor; they are extracted into parallel columns
+	# (fn_xxx) so that the emitter can walk them with zip() instead of
+	# loading them per record.  The columns are frozen as tuples: they
+	# are never modified after normalization.
+
+	__slots__ = ('cls', 'class_num', 'name', 'internal_prototype', 'external_prototype',
+	             'external_constructor', 'length', 'length_attributes', 'native', 'nargs',
+	             'magic', 'extensible', 'flags', 'values', 'functions',
+	             'fn_names', 'fn_natives', 'fn_headers', 'fn_nargs', 'fn_magics', 'fn_flags',
+	             'fn_records')
+
+	def __init__(self, desc):
+		get = desc.get
+		self.cls = desc['class']
+		self.class_num = classToNumber(self.cls)
+		self.name = get('name')
+		self.internal_prototype = get('internal_prototype')
+		self.external_prototype = get('external_prototype')
+		self.external_constructor = get('external_constructor')
+		self.length = get('length')
+		self.length_attributes = get('length_attributes', LENGTH_PROPERTY_ATTRIBUTES)
+		self.native = get('native')
+		self.nargs = get('nargs')		# None: default nargs (= length)
+		self.magic = get('magic')
+		self.extensible = get('extensible', True)
+		self.flags = descriptorFlags(varargs=get('varargs', False), callable=get('callable', False),
+		                             constructable=get('constructable', False))
+		self.values = [ internValueProp(v) for v in desc['values'] ]
+		funcs = self.functions = [ internFunctionProp(FunctionProp(**f)) for f in desc['functions'] ]
+		self.fn_names = tuple([ f.name for f in funcs ])
+		self.fn_natives = tuple([ f.native for f in funcs ])
+		self.fn_headers = tuple([ packFunctionHeader(f) for f in funcs ])
+		self.fn_nargs = tuple([ packFunctionNargs(f) for f in funcs ])
+		self.fn_magics = tuple([ f.magic for f in funcs ])
+		self.fn_flags = tuple([ f.flags for f in funcs ])
+		self.fn_records = None		# encoded per instance, see preresolveFunctions()
+
+for _bi in builtins_orig:
+	_bi['info'] = BuiltinInfo(_bi['info'])
+
+# Property value encoding minus the double payload is independent of the
+# byte order.  Encoded prefixes are cached as (value, nbits) pairs so that
+# the profiles generated in one run share the work.
+
+class BitCollector(object):
+	"Collect bit fields into a single integer, for replay into a BitEncoder."
+
+	__slots__ = ('value', 'nbits')
+
+	def __init__(self):
+		self.value = 0
+		self.nbits = 0
+
+	def bits(self, x, nbits):
+		assert((x >> nbits) == 0)
+		self.value = (self.value << nbits) | x
+		self.nbits += nbits
+
+	def chars(self, x, nbits):
+		for t in bytearray(x):
+			self.bits(t, nbits)
+
+_prop_prefix_caches = {}
+
+def valuePrefixKey(valspec):
+	# Only string and builtin values affect the prefix; for other types
+	# the type code (ptype) is enough.
+	val = valspec.value
+	if valspec.ptype == PROP_TYPE_STRING:
+		valkey = val
+	elif valspec.ptype == PROP_TYPE_BUILTIN:
+		valkey = val['id']
+	else:
+		valkey = None
+	return (valspec.name, valspec.attributes, valspec.ptype, valkey, valspec.getter, valspec.setter)
+
+# The built-in string table does not depend on byte order or other profile
+# options; it is generated on first use and then shared by all instances.
+# GenStrings is not modified after processStrings().
+
+_gen_strings = None
+
+def getStrings():
+	global _gen_strings
+	if _gen_strings is None:
+		_gen_strings = genstrings.GenStrings()
+		_gen_strings.processStrings()
+	return _gen_strings
+
 #
 #  GenBuiltins
 #
 
 class GenBuiltins:
 	build_info = None
-	byte_order = None
+	byte_orders = None
 	ext_section_b = None
 	ext_browser_like = None
+	exclude_flags = None
 
 	builtins = None
 	gs = None
+	string_to_index = None
 	init_data = None
 	native_func_hash = None
 	native_func_list = None
 	builtin_indexes = None
+	builtins_by_id = None
+	builtin_ref_counts = None
+	double_cache = None
+	build_prop = None
+	prop_encoders = None
+	prop_prefix_cache = None
+	double_table = None
+	double_index = None
+
+	stridx_bits = None
+	natidx_bits = None
+	bidx_bits = None
+	bidx_short_bits = None
+	num_normal_props_bits = None
+	num_func_props_bits = None
+	double_idx_bits = None
 
 	count_builtins = None
 	count_normal_props = None
 	count_function_props = None
 
-	def __init__(self, build_info = None, byte_order=None, ext_section_b=None, ext_browser_like=None):
+	def __init__(self, build_info = None, byte_orders=None, ext_section_b=None, ext_browser_like=None):
+		if byte_orders is None:
+			byte_orders = _byte_orders
+		for t in byte_orders:
+			if t not in _byte_orders:
+				raise Exception('unsupported byte order: %s' % repr(t))
+
 		self.build_info = build_info
-		self.byte_order = byte_order
+		self.byte_orders = list(byte_orders)
 		self.ext_section_b = ext_section_b
 		self.ext_browser_like = ext_browser_like
 
+		# descriptor flags which cause a property to be left out
+		self.exclude_flags = 0
+		if not ext_section_b:
+			self.exclude_flags |= FLAG_SECTION_B
+		if not ext_browser_like:
+			self.exclude_flags |= FLAG_BROWSER
+
+		# processBuiltins() modifies the descriptors (e.g. it adds the
+		# 'version' property to bi_duk), so work on a copy and leave
+		# builtins_orig intact.
 		self.builtins = copy.deepcopy(builtins_orig)
+		self.sortBuiltinsByReferences()
 		self.gs = None
 		self.init_data = None
 		self.native_func_hash = {}
 		self.native_func_list = []
-		self.builtin_indexes = {}
+		self.initBuiltinIndex()
+		self.double_cache = {}
+		self.prop_encoders = [
+			self.encodeDoubleValue,		# PROP_TYPE_DOUBLE
+			self.encodeStringValue,		# PROP_TYPE_STRING
+			self.encodeStringValue,		# PROP_TYPE_STRIDX (chosen by encodeStringValue)
+			self.encodeBuiltinValue,	# PROP_TYPE_BUILTIN
+			self.encodeUndefinedValue,	# PROP_TYPE_UNDEFINED
+			self.encodeTrueValue,		# PROP_TYPE_BOOLEAN_TRUE
+			self.encodeFalseValue,		# PROP_TYPE_BOOLEAN_FALSE
+			self.encodeAccessorValue	# PROP_TYPE_ACCESSOR
+		]
 
 		self.count_builtins = 0
 		self.count_normal_props = 0
 		self.count_function_props = 0
 
 	def findBuiltIn(self, id_):
-		for i in self.builtins:
-			if i['id'] == id_:
-				return i
-		return None
+		return self.builtins_by_id.get(id_)
+
+	def sortBuiltinsByReferences(self):
+		# Built-in indexes are encoded with a short code for the lowest
+		# indexes, so order the builtins by the number of references to
+		# them from other builtins (prototype and constructor links and
+		# builtin valued properties).  Ties keep the source order.  The
+		# counts don't consider the profile options, so the order and
+		# the DUK_BIDX_xxx values are the same for all profiles.
+		counts = dict((bi['id'], 0) for bi in self.builtins)
+		for bi in self.builtins:
+			info = bi['info']
+			for key in ('internal_prototype', 'external_prototype', 'external_constructor'):
+				idx = getattr(info, key)
+				if idx is not None:
+					counts[idx] += 1
+			for valspec in info.values:
+				if valspec.ptype == PROP_TYPE_BUILTIN:
+					counts[valspec.value['id']] += 1
+
+		self.builtins.sort(key=lambda bi: -counts[bi['id']])  # stable
+		self.builtin_ref_counts = [ counts[bi['id']] for bi in self.builtins ]
 
 	def initBuiltinIndex(self):
-		idx = 0
-		for bi in self.builtins:
-			self.builtin_indexes[bi['id']] = idx
-			idx += 1
+		# The set of builtins is fixed once copied, so the id lookups
+		# are indexed up front.
+		self.builtin_indexes = dict((bi['id'], idx) for idx, bi in enumerate(self.builtins))
+		self.builtins_by_id = dict((bi['id'], bi) for bi in self.builtins)
 
 	def getNativeFuncs(self, bi):
-		if bi.has_key('native'):
-			native_func = bi['native']
-			self.native_func_hash[native_func] = -1
-
-		for valspec in bi['values']:
-			if valspec.has_key('getter'):
-				native_func = valspec['getter']
-				self.native_func_hash[native_func] = -1
-			if valspec.has_key('setter'):
-				native_func = valspec['setter']
-				self.native_func_hash[native_func] = -1
-
-		for funspec in bi['functions']:
-			if funspec.has_key('native'):
-				native_func = funspec['native']
-				self.native_func_hash[native_func] = -1
-	
+		# Yield the names of all native functions referenced by a builtin.
+		if bi.native is not None:
+			yield bi.native
+
+		for valspec in bi.values:
+			if valspec.getter is not None:
+				yield valspec.getter
+			if valspec.setter is not None:
+				yield valspec.setter
+
+		for funspec in bi.functions:
+			yield funspec.native
+
 	def numberNativeFuncs(self):
-		k = self.native_func_hash.keys()
-		k.sort()
-		idx = 0
-		for i in k:
-			self.native_func_hash[i] = idx
-			self.native_func_list.append(i)
-			idx += 1
+		# Native functions are numbered in the order they are first seen;
+		# the builtins are always walked in the same order, so the
+		# numbering is deterministic.
+		native_func_list = self.native_func_list = []
+		native_func_hash = self.native_func_hash = {}
+		for bi in self.builtins:
+			for name in self.getNativeFuncs(bi['info']):
+				if name not in native_func_hash:
+					native_func_hash[name] = len(native_func_list)
+					native_func_list.append(name)
+
+	def computeBitWidths(self):
+		# Index and count fields are only as wide as the data requires.
+		# The widths are emitted into the header for the decoder.
+		def width(maxval):
+			return max(1, maxval.bit_length())
+
+		self.stridx_bits = width(len(self.gs.strlist) - 1)
+		self.natidx_bits = width(len(self.native_func_list) - 1)
+
+		self.bidx_bits = width(len(self.builtins) - 1)
+
+		# A built-in index is encoded either as a flag bit and a short
+		# index for the most referenced builtins, or as a flag bit and a
+		# full index; pick the short width which minimizes total size.
+		refs = self.builtin_ref_counts
+		best = None
+		for nbits in range(1, self.bidx_bits):
+			nshort = sum(refs[:1 << nbits])
+			size = nshort * nbits + (sum(refs) - nshort) * self.bidx_bits
+			if best is None or size < best:
+				best = size
+				self.bidx_short_bits = nbits
+		if self.bidx_short_bits is None:
+			self.bidx_short_bits = self.bidx_bits
+
+		# Counts are computed before filtering, which may only make
+		# them smaller.
+		self.num_normal_props_bits = width(max([ len(bi['info'].values) for bi in self.builtins ]))
+		self.num_func_props_bits = width(max([ len(bi['info'].functions) for bi in self.builtins ]))
+
+	def initDoubleTable(self):
+		# Doubles which occur more than once (NaN, infinities, zero)
+		# are placed in a table shared by all byte orders and referred
+		# to by index.  The table is stored as high/low 32-bit words so
+		# that it does not depend on byte order.
+		counts = {}
+		order = []
+		for bi in self.builtins:
+			for valspec in bi['info'].values:
+				if valspec.ptype != PROP_TYPE_DOUBLE or (valspec.flags & self.exclude_flags):
+					continue
+				key = double_bits(float(valspec.value))
+				if key not in counts:
+					counts[key] = 0
+					order.append(key)
+				counts[key] += 1
+
+		self.double_table = [ key for key in order if counts[key] > 1 ]
+		if len(self.double_table) == 0:
+			# C does not allow an empty array, the entry is never used
+			self.double_table = [ double_bits(DBL_NAN) ]
+		self.double_index = dict((key, idx) for idx, key in enumerate(self.double_table))
+		self.double_idx_bits = max(1, (len(self.double_table) - 1).bit_length())
+
+	def writeDoubleTable(self, genc):
+		genc.emitLine('/* shared double values: %d */' % len(self.double_table))
+		genc.emitLine('const duk_uint32_t duk_builtins_doubles[] = {')
+		genc.emitLines([ '\t0x%08xUL, 0x%08xUL,' % (key >> 32, key & 0xffffffff) for key in self.double_table ])
+		genc.emitLine('};')
 
 	def writeNativeFuncArray(self, genc):
-		genc.emitLine('/* native functions: %d */' % len(self.native_func_list))
-		genc.emitLine('const duk_c_function duk_builtin_native_functions[] = {')
-		for i in self.native_func_list:
-			genc.emitLine('\t(duk_c_function) %s,' % i)
-		genc.emitLine('};')
+		lines = [ '/* native functions: %d */' % len(self.native_func_list),
+		          'const duk_c_function duk_builtin_native_functions[] = {' ]
+		lines += [ '\t(duk_c_function) %s,' % i for i in self.native_func_list ]
+		lines.append('};')
+		genc.emitLines(lines)
 
 	def generateDefineNames(self, id):
 		t1 = id.upper().split('_')
@@ -1371,38 +1653,20 @@ class GenBuiltins:
 
 	def encodePropertyFlags(self, flags):
 		# Note: must match duk_hobject.h
-
-		res = 0
-		nflags = 0
-		if 'w' in flags:
-			nflags += 1
-			res = res | PROPDESC_FLAG_WRITABLE
-		if 'e' in flags:
-			nflags += 1
-			res = res | PROPDESC_FLAG_ENUMERABLE
-		if 'c' in flags:
-			nflags += 1
-			res = res | PROPDESC_FLAG_CONFIGURABLE
-		if 'a' in flags:
-			nflags += 1
-			res = res | PROPDESC_FLAG_ACCESSOR
-
-		if nflags != len(flags):
+		try:
+			return _property_flags[''.join(sorted(flags))]
+		except KeyError:
 			raise Exception('unsupported flags: %s' % repr(flags))
 
-		return res
-
 	def resolveMagic(self, elem):
 		if elem is None:
 			return 0
-		assert(elem.has_key('type'))
+		assert('type' in elem)
 		if elem['type'] == 'bidx':
 			v = elem['value']
-			for i, bi in enumerate(self.builtins):
-				if bi['id'] == v:
-					#print(v, '->', i)
-					return i
-			raise Exception('invalid builtin index for magic: ' % repr(v))
+			if v not in self.builtin_indexes:
+				raise Exception('invalid builtin index for magic: %s' % repr(v))
+			return self.builtin_indexes[v]
 		elif elem['type'] == 'plain':
 			v = elem['value']
 			if not (v >= -0x8000 and v <= 0x7fff):
@@ -1414,181 +1678,245 @@ class GenBuiltins:
 		else:
 			raise Exception('invalid magic type: %s' % repr(elem['type']))
 
-	def generatePropertiesDataForBuiltin(self, be, bi):
-		self.count_builtins += 1
-
-		if bi.has_key('internal_prototype'):
-			be.bits(self.builtin_indexes[bi['internal_prototype']], BIDX_BITS)
+	def packDouble(self, val, byte_order):
+		# The same few constants (NaN, infinities, Math constants) recur
+		# in many places, so cache the packed representation.  Zeros and
+		# NaNs bypass the cache: -0.0 compares equal to 0.0 and NaN is
+		# not equal to itself, so neither can be keyed by value.
+		# All byte orders are packed at the same time.
+		cacheable = (val == val and val != 0.0)
+		if cacheable:
+			packed = self.double_cache.get(val)
+			if packed is not None:
+				return packed[byte_order]
+
+		packed = packDoubleByteOrders(val)
+		data = packed[byte_order]
+
+		#print('DOUBLE: ' + data.encode('hex'))
+
+		if len(data) != 8:
+			raise Exception('internal error')
+		if cacheable:
+			self.double_cache[val] = packed
+		return data
+
+	def resolveByteOrderField(self, key, byte_order):
+		# Fill in a field left as a placeholder because its encoding
+		# depends on the byte order, see generatePropertiesDataForBuiltin().
+		kind, val = key
+		if kind == 'double':
+			return _u64_big.unpack(self.packDouble(val, byte_order))[0], 64
+
+		# The 'build' string includes the byte order
+		assert(kind == 'build')
+		bc = BitCollector()
+		self.generateValuePrefix(bc, ValueProp('build', value=val + '; ' + byte_order, attributes=''))
+		return bc.value, bc.nbits
+
+	# Property value encoders, indexed by the PROP_TYPE_XXX determined
+	# for each value when the descriptors are normalized.
+
+	def encodeDoubleValue(self, be, valspec):
+		be.bits(PROP_TYPE_DOUBLE, PROP_TYPE_BITS)
+
+	def encodeStringValue(self, be, valspec):
+		val = valspec.value
+
+		stridx = self.string_to_index.get(val)
+		if stridx is not None:
+			# String value is in built-in string table -> encode
+			# using a string index.  This saves some space,
+			# especially for the 'name' property of errors
+			# ('EvalError' etc).
+
+			be.bits(PROP_TYPE_STRIDX, PROP_TYPE_BITS)
+			be.bits(stridx, self.stridx_bits)
 		else:
-			be.bits(NO_BIDX_MARKER, BIDX_BITS)
+			# Not in string table -> encode as raw 7-bit value
 
-		if bi.has_key('external_prototype'):
-			be.bits(self.builtin_indexes[bi['external_prototype']], BIDX_BITS)
-		else:
-			be.bits(NO_BIDX_MARKER, BIDX_BITS)
+			if isinstance(val, _text_type):
+				# Note: non-ASCII characters will not currently work,
+				# because bits/char is too low.
+				val = val.encode('utf-8')
 
-		if bi.has_key('external_constructor'):
-			be.bits(self.builtin_indexes[bi['external_constructor']], BIDX_BITS)
-		else:
-			be.bits(NO_BIDX_MARKER, BIDX_BITS)
+			be.bits(PROP_TYPE_STRING, PROP_TYPE_BITS)
+			be.bits(len(val), STRING_LENGTH_BITS)
+			be.chars(val, STRING_CHAR_BITS)
 
-		# Filter values and functions
-		values = []
-		for valspec in bi['values']:
-			if valspec.has_key('section_b') and valspec['section_b'] and not gb.ext_section_b:
-				continue
-			if valspec.has_key('browser') and valspec['browser'] and not gb.ext_browser_like:
-				continue
-			values.append(valspec)
-
-		functions = []
-		for valspec in bi['functions']:
-			if valspec.has_key('section_b') and valspec['section_b'] and not self.ext_section_b:
-				continue
-			if valspec.has_key('browser') and valspec['browser'] and not self.ext_browser_like:
-				continue
-			functions.append(valspec)
+	def encodeBuiltinIndex(self, be, idx):
+		if idx < (1 << self.bidx_short_bits):
+			be.bits(0, 1)  # flag: short index
+			be.bits(idx, self.bidx_short_bits)
+		else:
+			be.bits(1, 1)  # flag: full index
+			be.bits(idx, self.bidx_bits)
+
+	def encodeBuiltinValue(self, be, valspec):
+		be.bits(PROP_TYPE_BUILTIN, PROP_TYPE_BITS)
+		self.encodeBuiltinIndex(be, self.builtin_indexes[valspec.value['id']])
+
+	def encodeUndefinedValue(self, be, valspec):
+		be.bits(PROP_TYPE_UNDEFINED, PROP_TYPE_BITS)
+
+	def encodeTrueValue(self, be, valspec):
+		be.bits(PROP_TYPE_BOOLEAN_TRUE, PROP_TYPE_BITS)
+
+	def encodeFalseValue(self, be, valspec):
+		be.bits(PROP_TYPE_BOOLEAN_FALSE, PROP_TYPE_BITS)
+
+	def encodeAccessorValue(self, be, valspec):
+		be.bits(PROP_TYPE_ACCESSOR, PROP_TYPE_BITS)
+		natidx = self.native_func_hash[valspec.getter]
+		be.bits(natidx, self.natidx_bits)
+		natidx = self.native_func_hash[valspec.setter]
+		be.bits(natidx, self.natidx_bits)
+
+	def encodeAttributes(self, be, attrs, default_attrs):
+		# Nearly all properties have the default attributes, so only a
+		# flag bit is emitted for them; the flags field follows only
+		# when the attributes differ.  The default is 'wc' except for
+		# 'length' (see ValueProp), and the decoder must agree.
+		#
+		# attribute check doesn't check for accessor flag; that is now
+		# automatically set by C code when value is an accessor type
+		if attrs is None or attrs == default_attrs:
+			be.bits(0, 1)  # flag: no custom attributes
+		else:
+			# flag (have custom attributes) and flags field in one go
+			be.bits((1 << PROP_FLAGS_BITS) | self.encodePropertyFlags(attrs), 1 + PROP_FLAGS_BITS)
 
-		be.bits(len(values), NUM_NORMAL_PROPS_BITS)
+	def generateValuePrefix(self, be, valspec):
+		stridx = self.string_to_index[valspec.name]
+		be.bits(stridx, self.stridx_bits)
 
-		for valspec in values:
-			self.count_normal_props += 1
+		self.encodeAttributes(be, valspec.attributes, valspec.default_attributes)
 
-			# NOTE: we rely on there being less than 256 built-in strings
-			stridx = self.gs.stringToIndex(valspec['name'])
-			val = valspec.get('value')  # missing for accessors
+		# for doubles, this emits the type only; the byte order
+		# dependent payload is emitted by the caller
+		self.prop_encoders[valspec.ptype](be, valspec)
 
-			be.bits(stridx, STRIDX_BITS)
+	def generatePropertiesDataForBuiltin(self, be, bi):
+		# This is the hot path of the generator: bind frequently used
+		# methods and maps to locals to avoid repeated attribute lookups.
+		bits = be.bits
+		bidx = self.builtin_indexes
+		prefix_cache = self.prop_prefix_cache
+		build_prop = self.build_prop
+		encode_bidx = self.encodeBuiltinIndex
+		double_index = self.double_index
+		double_idx_bits = self.double_idx_bits
 
-			if valspec['name'] == 'length':
-				default_attrs = LENGTH_PROPERTY_ATTRIBUTES
-			else:
-				default_attrs = DEFAULT_PROPERTY_ATTRIBUTES
-			attrs = default_attrs
-			if valspec.has_key('attributes'):
-				attrs = valspec['attributes']
-
-			# attribute check doesn't check for accessor flag; that is now
-			# automatically set by C code when value is an accessor type
-			if attrs != default_attrs:
-				#print 'non-default attributes: %s -> %r (default %r)' % (valspec['name'], attrs, default_attrs)
-				be.bits(1, 1)  # flag: have custom attributes
-				be.bits(self.encodePropertyFlags(attrs), PROP_FLAGS_BITS)
-			else:
-				be.bits(0, 1)  # flag: no custom attributes
+		self.count_builtins += 1
 
-			if isinstance(val, bool):
-				if val == True:
-					be.bits(PROP_TYPE_BOOLEAN_TRUE, PROP_TYPE_BITS)
-				else:
-					be.bits(PROP_TYPE_BOOLEAN_FALSE, PROP_TYPE_BITS)
-			elif val == UNDEFINED:
-				be.bits(PROP_TYPE_UNDEFINED, PROP_TYPE_BITS)
-			elif isinstance(val, (float, int)):
-				be.bits(PROP_TYPE_DOUBLE, PROP_TYPE_BITS)
-				val = float(val)
-
-				# encoding of double must match target architecture byte order
-				bo = self.byte_order
-				if bo == 'big':
-					data = struct.pack('>d', val)	# 01234567
-				elif bo == 'little':
-					data = struct.pack('<d', val)	# 76543210
-				elif bo == 'middle':	# arm
-					data = struct.pack('<d', val)	# 32107654
-					data = data[4:8] + data[0:4]
-				else:
-					raise Exception('unsupported byte order: %s' % repr(bo))
-
-				#print('DOUBLE: ' + data.encode('hex'))
-
-				if len(data) != 8:
-					raise Exception('internal error')
-				be.string(data)
-			elif isinstance(val, str) or isinstance(val, unicode):
-				if isinstance(val, unicode):
-					# Note: non-ASCII characters will not currently work,
-					# because bits/char is too low.
-					val = val.encode('utf-8')
-
-				if self.gs.hasString(val):
-					# String value is in built-in string table -> encode
-					# using a string index.  This saves some space,
-					# especially for the 'name' property of errors
-					# ('EvalError' etc).
-	
-					stridx = self.gs.stringToIndex(val)
-					be.bits(PROP_TYPE_STRIDX, PROP_TYPE_BITS)
-					be.bits(stridx, STRIDX_BITS)
-				else:
-					# Not in string table -> encode as raw 7-bit value
-	
-					be.bits(PROP_TYPE_STRING, PROP_TYPE_BITS)
-					be.bits(len(val), STRING_LENGTH_BITS)
-					for i in xrange(len(val)):
-						t = ord(val[i])
-						be.bits(t, STRING_CHAR_BITS)
-			elif isinstance(val, dict):
-				if val['type'] == 'builtin':
-					be.bits(PROP_TYPE_BUILTIN, PROP_TYPE_BITS)
-					be.bits(self.builtin_indexes[val['id']], BIDX_BITS)
-				else:
-					raise Exception('unsupported value: %s' % repr(val))
-			elif val is None and valspec.has_key('getter') and valspec.has_key('setter'):
-				be.bits(PROP_TYPE_ACCESSOR, PROP_TYPE_BITS)
-				natidx = self.native_func_hash[valspec['getter']]
-				be.bits(natidx, NATIDX_BITS)
-				natidx = self.native_func_hash[valspec['setter']]
-				be.bits(natidx, NATIDX_BITS)
+		# Internal prototype, external prototype and external constructor
+		# are optional: a flag bit is followed by the index only when the
+		# link exists, instead of spending a full index on a 'no builtin'
+		# marker.
+		for idx in (bi.internal_prototype, bi.external_prototype, bi.external_constructor):
+			if idx is None:
+				bits(0, 1)  # flag: no builtin
 			else:
-				raise Exception('unsupported value: %s' % repr(val))
+				bits(1, 1)  # flag: have builtin
+				encode_bidx(be, bidx[idx])
 
-		be.bits(len(functions), NUM_FUNC_PROPS_BITS)
-
-		for funspec in functions:
-			self.count_function_props += 1
-
-			# NOTE: we rely on there being less than 256 built-in strings
-			# and built-in native functions
+		# Filter values and functions
+		exclude_flags = self.exclude_flags
+		values = [ v for v in bi.values if not (v.flags & exclude_flags) ]
+		functions = [ rec for rec, flags in zip(bi.fn_records, bi.fn_flags)
+		              if not (flags & exclude_flags) ]
 
-			stridx = self.gs.stringToIndex(funspec['name'])
-			be.bits(stridx, STRIDX_BITS)
+		self.count_normal_props += len(values)
+		self.count_function_props += len(functions)
 
-			natidx = self.native_func_hash[funspec['native']]
-			be.bits(natidx, NATIDX_BITS)
+		bits(len(values), self.num_normal_props_bits)
 
-			length = funspec['length']
-			be.bits(length, LENGTH_PROP_BITS)
+		for valspec in values:
+			# Byte order dependent fields are left as placeholders and
+			# filled in separately for each byte order.
+			if valspec is build_prop:
+				be.placeholder(('build', valspec.value))
+				continue
 
-			if funspec.has_key('varargs'):
-				be.bits(1, 1)  # flag: non-default nargs
-				be.bits(NARGS_VARARGS_MARKER, NARGS_BITS)
-			elif funspec.has_key('nargs'):
-				be.bits(1, 1)  # flag: non-default nargs
-				be.bits(funspec['nargs'], NARGS_BITS)
+			key = valuePrefixKey(valspec)
+			prefix = prefix_cache.get(key)
+			if prefix is None:
+				bc = BitCollector()
+				self.generateValuePrefix(bc, valspec)
+				prefix = prefix_cache[key] = (bc.value, bc.nbits)
+			bits(prefix[0], prefix[1])
+
+			if valspec.ptype == PROP_TYPE_DOUBLE:
+				val = float(valspec.value)
+				idx = double_index.get(double_bits(val))
+				if idx is not None:
+					bits(1, 1)  # flag: shared double
+					bits(idx, double_idx_bits)
+				else:
+					bits(0, 1)  # flag: inline double
+					be.placeholder(('double', val))
+
+		bits(len(functions), self.num_func_props_bits)
+
+		for value, nbits in functions:
+			bits(value, nbits)
+
+	def encodeFunctionProp(self, be, name, native, header, nargs, magic):
+		be.bits(self.string_to_index[name], self.stridx_bits)
+		be.bits(self.native_func_hash[native], self.natidx_bits)
+
+		# length flag and length
+		be.bits(header[0], header[1])
+
+		# About half of the function properties are simple methods
+		# with default nargs and no magic, which only need a flag
+		# bit.  Otherwise the magic flag is only needed if nargs is
+		# not the default.
+		magic = self.resolveMagic(magic)
+		assert(magic >= 0)
+		assert(magic < (1 << MAGIC_BITS))
+		if nargs is None:
+			if magic == 0:
+				be.bits(0, 1)  # flag: simple method
 			else:
-				be.bits(0, 1)  # flag: default nargs OK
-
-			# FIXME: make this check conditional to minimize bit count
-			# (there are quite a lot of function properties)
-			magic = self.resolveMagic(funspec.get('magic'))
+				be.bits(1, 1)  # flag: not a simple method
+				be.bits(0, 1)  # flag: default nargs, magic follows
+				be.bits(magic, MAGIC_BITS)
+		else:
+			be.bits(1, 1)  # flag: not a simple method
+			be.bits(nargs[0], nargs[1])
 			if magic != 0:
-				assert(magic >= 0)
-				assert(magic < (1 << MAGIC_BITS))
-				be.bits(1, 1)
+				be.bits(1, 1)  # flag: have magic
 				be.bits(magic, MAGIC_BITS)
 			else:
-				be.bits(0, 1)
+				be.bits(0, 1)  # flag: no magic
+
+	def preresolveFunctions(self):
+		# A function property record only depends on the numbering of
+		# strings, native functions and builtins, so each record is
+		# encoded into a single (value, nbits) field once, and the
+		# emitter just copies the fields.
+		for bi in self.builtins:
+			info = bi['info']
+			records = []
+			for t in zip(info.fn_names, info.fn_natives, info.fn_headers,
+			             info.fn_nargs, info.fn_magics):
+				bc = BitCollector()
+				self.encodeFunctionProp(bc, *t)
+				records.append((bc.value, bc.nbits))
+			info.fn_records = tuple(records)
 
 	def generateCreationDataForBuiltin(self, be, bi):
-		class_num = classToNumber(bi['class'])
-		be.bits(class_num, CLASS_BITS)
+		bits = be.bits
 
-		if bi.has_key('length'):
-			be.bits(1, 1)  # flag: have length
-			be.bits(bi['length'], LENGTH_PROP_BITS)
+		bits(bi.class_num, CLASS_BITS)
+
+		length = bi.length
+		if length is not None:
+			bits(1, 1)  # flag: have length
+			bits(length, LENGTH_PROP_BITS)
 		else:
-			be.bits(0, 1)  # flag: no length
+			bits(0, 1)  # flag: no length
 
 		# This is a very unfortunate format; 'length' property of a top
 		# level object may be non-standard.  However, this is only the
@@ -1596,12 +1924,8 @@ class GenBuiltins:
 		# attributes expected of an Array instance.  This is handled
 		# with custom code in duk_hthread_builtins.c
 
-		len_attrs = LENGTH_PROPERTY_ATTRIBUTES
-		if bi.has_key('length_attributes'):
-			len_attrs = bi['length_attributes']
-
-		if len_attrs != LENGTH_PROPERTY_ATTRIBUTES:
-			if bi['class'] != 'Array':  # Array.prototype is the only one with this class
+		if bi.length_attributes != LENGTH_PROPERTY_ATTRIBUTES:
+			if bi.cls != 'Array':  # Array.prototype is the only one with this class
 				raise Exception('non-default length attribute for unexpected object')
 
 		# For 'Function' classed objects, emit the native function stuff.
@@ -1609,79 +1933,100 @@ class GenBuiltins:
 		# function properties now.  This should be addressed if a rework
 		# on the init format is done.
 
-		if bi['class'] == 'Function':
-			length = bi['length']
+		if bi.cls == 'Function':
+			natidx = self.native_func_hash[bi.native]
+			bits(natidx, self.natidx_bits)
 
-			natidx = self.native_func_hash[bi['native']]
-			be.bits(natidx, NATIDX_BITS)
+			stridx = self.string_to_index[bi.name]
+			bits(stridx, self.stridx_bits)
 
-			stridx = self.gs.stringToIndex(bi['name'])
-			be.bits(stridx, STRIDX_BITS)
+			flags = bi.flags
 
-			if bi.has_key('varargs'):
-				be.bits(1, 1)  # flag: non-default nargs
-				be.bits(NARGS_VARARGS_MARKER, NARGS_BITS)
-			elif bi.has_key('nargs'):
-				be.bits(1, 1)  # flag: non-default nargs
-				be.bits(bi['nargs'], NARGS_BITS)
+			if flags & FLAG_VARARGS:
+				bits(1, 1)  # flag: non-default nargs
+				bits(0, 1)  # flag: varargs
+			elif bi.nargs is not None:
+				bits(1, 1)  # flag: non-default nargs
+				bits(1, 1)  # flag: explicit nargs
+				bits(bi.nargs, NARGS_BITS)
 			else:
-				be.bits(0, 1)  # flag: default nargs OK
+				bits(0, 1)  # flag: default nargs OK
 
 			# All Function-classed global level objects are callable
 			# (have [[Call]]) but not all are constructable (have
 			# [[Construct]]).  Flag that.
 
-			assert(bi.has_key('callable'))
-			assert(bi['callable'] == True)
+			assert(flags & FLAG_CALLABLE)
 
-			if bi.has_key('constructable') and bi['constructable'] == True:
-				be.bits(1, 1)	# flag: constructable
+			if flags & FLAG_CONSTRUCTABLE:
+				bits(1, 1)	# flag: constructable
 			else:
-				be.bits(0, 1)	# flag: not constructable
+				bits(0, 1)	# flag: not constructable
 
-			magic = self.resolveMagic(bi.get('magic'))
+			magic = self.resolveMagic(bi.magic)
 			if magic != 0:
 				assert(magic >= 0)
 				assert(magic < (1 << MAGIC_BITS))
-				be.bits(1, 1)
-				be.bits(magic, MAGIC_BITS)
+				bits(1, 1)
+				bits(magic, MAGIC_BITS)
 			else:
-				be.bits(0, 1)
+				bits(0, 1)
 
 	def processBuiltins(self):
-		# finalize built-in data
-		# FIXME: built-in data would actually need to be regenerated for each
-		# byte order / profile variant, fix later
-
-		build_new = self.build_info['build'] + '; ' + self.byte_order
+		# finalize built-in data; the 'build' value is completed for each
+		# byte order separately
+		self.build_prop = ValueProp('build', value=self.build_info['build'], attributes='')
 		bi_duk = self.findBuiltIn('bi_duk')['info']
-		bi_duk['values'].insert(0, { 'name': 'version', 'value': int(build_info['version']), 'attributes': '' })
-		bi_duk['values'].insert(1, { 'name': 'build', 'value': build_new, 'attributes': '' })
+		bi_duk.values[0:0] = [
+			ValueProp('version', value=int(self.build_info['version']), attributes=''),
+			self.build_prop
+		]
+
+		# built-in strings
+		self.gs = getStrings()
 
-		# generate built-in strings
-		self.gs = genstrings.GenStrings()
-		self.gs.processStrings()
+		# string -> stridx lookups are frequent, use the map directly
+		# instead of going through a method call every time
+		self.string_to_index = self.gs.string_to_index
 
 		# init indexes etc
-		self.initBuiltinIndex()
-		for bi in self.builtins:
-			self.getNativeFuncs(bi['info'])
 		self.numberNativeFuncs()
+		self.computeBitWidths()
+		self.initDoubleTable()
+		self.preresolveFunctions()
 
-		# First, emit the control data required for creating correct
-		# objects.  Then emit object properties.
+		# Encoded property prefixes can be shared with other instances
+		# which number builtins and native functions identically.
+		layout = (tuple([ bi['id'] for bi in self.builtins ]), tuple(self.native_func_list))
+		self.prop_prefix_cache = _prop_prefix_caches.setdefault(layout, {})
 
-		be = dukutil.BitEncoder()
+		# First, emit the control data required for creating correct
+		# objects.  Then emit object properties.  Both are generated in a
+		# single walk over the builtins into separate field lists, which
+		# are then joined.  The fields are the same for all byte orders
+		# except for a few placeholders, and are bit packed in one go for
+		# each byte order.
+
+		fields = dukutil.BitFieldList()
+		prop_fields = dukutil.BitFieldList()
 		for bi in self.builtins:
-			self.generateCreationDataForBuiltin(be, bi['info'])
+			info = bi['info']
+			self.generateCreationDataForBuiltin(fields, info)
+			self.generatePropertiesDataForBuiltin(prop_fields, info)
+		fields.extend(prop_fields)
 
-		for bi in self.builtins:
-			self.generatePropertiesDataForBuiltin(be, bi['info'])
+		self.init_data = {}
+		for t in self.byte_orders:
+			be = dukutil.BitEncoder()
+			be.fields(fields.resolve(lambda key: self.resolveByteOrderField(key, t)))
+			self.init_data[t] = be.getByteString()
 
-		self.init_data = be.getByteString()
+			print('%d bytes of built-in init data (%s), %d built-in objects, %d normal props, %d func props' % \
+				(len(self.init_data[t]), t, self.count_builtins, self.count_normal_props, self.count_function_props))
 
-		print '%d bytes of built-in init data, %d built-in objects, %d normal props, %d func props' % \
-			(len(self.init_data), self.count_builtins, self.count_normal_props, self.count_function_props)
+	# The string table, the native function array and the built-in
+	# indices are the same for all byte orders.  Only the init data and
+	# its length are emitted separately for each byte order.
 
 	def emitSource(self, genc):
 		self.gs.emitStringsData(genc)
@@ -1689,24 +2034,81 @@ class GenBuiltins:
 		genc.emitLine('')
 		self.writeNativeFuncArray(genc)
 		genc.emitLine('')
-		genc.emitArray(self.init_data, 'duk_builtins_data', typename='duk_uint8_t', intvalues=True, const=True)
+		self.writeDoubleTable(genc)
+		genc.emitLine('')
 
 	def emitHeader(self, genc):
 		self.gs.emitStringsHeader(genc)
 
-		genc.emitLine('')
-		genc.emitLine('extern const duk_c_function duk_builtin_native_functions[];')
-		genc.emitLine('')
-		genc.emitLine('extern const duk_uint8_t duk_builtins_data[];')
-		genc.emitLine('')
-		genc.emitDefine('DUK_BUILTINS_DATA_LENGTH', len(self.init_data))
-		genc.emitLine('')
-		for idx,t in enumerate(self.builtins):
-			def_name1, def_name2 = self.generateDefineNames(t['id'])
-			genc.emitDefine(def_name1, idx)
-		genc.emitLine('')
-		genc.emitDefine('DUK_NUM_BUILTINS', len(self.builtins))
-		genc.emitLine('')
+		genc.emitRaw('\n'
+		             'extern const duk_c_function duk_builtin_native_functions[];\n'
+		             '\n'
+		             'extern const duk_uint8_t duk_builtins_data[];\n'
+		             'extern const duk_uint32_t duk_builtins_doubles[];\n'
+		             '\n')
+		# The defines are formatted first and emitted as a single block.
+		fmt = genc.formatDefine
+		lines = [ fmt(self.generateDefineNames(t['id'])[0], idx) for idx, t in enumerate(self.builtins) ]
+		lines += [
+			'',
+			fmt('DUK_NUM_BUILTINS', len(self.builtins)),
+			'',
+			fmt('DUK_BUILTINS_STRIDX_BITS', self.stridx_bits),
+			fmt('DUK_BUILTINS_NATIDX_BITS', self.natidx_bits),
+			fmt('DUK_BUILTINS_BIDX_BITS', self.bidx_bits),
+			fmt('DUK_BUILTINS_BIDX_SHORT_BITS', self.bidx_short_bits),
+			fmt('DUK_BUILTINS_NUM_NORMAL_PROPS_BITS', self.num_normal_props_bits),
+			fmt('DUK_BUILTINS_NUM_FUNC_PROPS_BITS', self.num_func_props_bits),
+			fmt('DUK_BUILTINS_NUM_DOUBLES', len(self.double_table)),
+			fmt('DUK_BUILTINS_DOUBLE_IDX_BITS', self.double_idx_bits),
+			''
+		]
+		genc.emitLines(lines)
+
+	def emitInitData(self, genc_src, genc_hdr, byte_order):
+		data = self.init_data[byte_order]
+		genc_src.emitArray(data, 'duk_builtins_data', typename='duk_uint8_t', intvalues=True, const=True)
+		genc_hdr.emitDefine('DUK_BUILTINS_DATA_LENGTH', len(data))
+
+# Byte order specific output is selected with the DUK_USE_DOUBLE_xx defines.
+_byte_order_defines = {
+	'little': 'DUK_USE_DOUBLE_LE',
+	'big': 'DUK_USE_DOUBLE_BE',
+	'middle': 'DUK_USE_DOUBLE_ME'
+}
+
+def emitByteOrderSwitch(gencs, byte_orders, emit_func):
+	# Emit a preprocessor switch into each of 'gencs', with the output of
+	# emit_func(byte_order) for each byte order; a byte order without
+	# generated data (either not supported at all or left out with
+	# --byte-orders) is an error.
+	directive = '#if'
+	for t in byte_orders:
+		for genc in gencs:
+			genc.emitLine('%s defined(%s)' % (directive, _byte_order_defines[t]))
+		emit_func(t)
+		directive = '#elif'
+	for genc in gencs:
+		genc.emitLines([ '#else', '#error invalid endianness defines', '#endif' ])
+
+def generateFiles(gb, genc_src, genc_hdr):
+	# C source and header files containing both strings and builtins,
+	# generated side by side in a single pass
+	genc_src.emitHeader('genbuiltins.py')
+	genc_src.emitRaw('#include "duk_internal.h"\n'
+	                 '\n')
+	gb.emitSource(genc_src)
+
+	genc_hdr.emitHeader('genbuiltins.py')
+	genc_hdr.emitRaw('#ifndef DUK_BUILTINS_H_INCLUDED\n'
+	                 '#define DUK_BUILTINS_H_INCLUDED\n'
+	                 '\n')
+	gb.emitHeader(genc_hdr)
+
+	emitByteOrderSwitch([ genc_src, genc_hdr ], gb.byte_orders, lambda t: gb.emitInitData(genc_src, genc_hdr, t))
+
+	genc_hdr.emitRaw('\n'
+	                 '#endif  /* DUK_BUILTINS_H_INCLUDED */\n')
 
 #
 #  Main
@@ -1717,57 +2119,20 @@ if __name__ == '__main__':
 	parser.add_option('--buildinfo', dest='buildinfo')
 	parser.add_option('--out-header', dest='out_header')
 	parser.add_option('--out-source', dest='out_source')
+	parser.add_option('--byte-orders', dest='byte_orders', default=','.join(_byte_orders))  # optional, e.g. 'little' for a little endian only build
 	(opts, args) = parser.parse_args()
 
 	f = open(opts.buildinfo, 'rb')
 	build_info = dukutil.json_decode(f.read().strip())
 	f.close()
 
-	# genbuiltins for different profiles
-	gb_little = GenBuiltins(build_info = build_info, byte_order='little', ext_section_b=True, ext_browser_like=True)
-	gb_little.processBuiltins()
-	gb_big = GenBuiltins(build_info = build_info, byte_order='big', ext_section_b=True, ext_browser_like=True)
-	gb_big.processBuiltins()
-	gb_middle = GenBuiltins(build_info = build_info, byte_order='middle', ext_section_b=True, ext_browser_like=True)
-	gb_middle.processBuiltins()
-
-	# write C source file containing both strings and builtins
-	genc = dukutil.GenerateC()
-	genc.emitHeader('genbuiltins.py')
-	genc.emitLine('#include "duk_internal.h"')
-	genc.emitLine('')
-	genc.emitLine('#if defined(DUK_USE_DOUBLE_LE)')
-	gb_little.emitSource(genc)
-	genc.emitLine('#elif defined(DUK_USE_DOUBLE_BE)')
-	gb_big.emitSource(genc)
-	genc.emitLine('#elif defined(DUK_USE_DOUBLE_ME)')
-	gb_middle.emitSource(genc)
-	genc.emitLine('#else')
-	genc.emitLine('#error invalid endianness defines')
-	genc.emitLine('#endif')
-
-	f = open(opts.out_source, 'wb')
-	f.write(genc.getString())
-	f.close()
-
-	# write C header file containing both strings and builtins
-	genc = dukutil.GenerateC()
-	genc.emitHeader('genbuiltins.py')
-	genc.emitLine('#ifndef DUK_BUILTINS_H_INCLUDED')
-	genc.emitLine('#define DUK_BUILTINS_H_INCLUDED')
-	genc.emitLine('')
-	genc.emitLine('#if defined(DUK_USE_DOUBLE_LE)')
-	gb_little.emitHeader(genc)
-	genc.emitLine('#elif defined(DUK_USE_DOUBLE_BE)')
-	gb_big.emitHeader(genc)
-	genc.emitLine('#elif defined(DUK_USE_DOUBLE_ME)')
-	gb_middle.emitHeader(genc)
-	genc.emitLine('#else')
-	genc.emitLine('#error invalid endianness defines')
-	genc.emitLine('#endif')
-	genc.emitLine('#endif  /* DUK_BUILTINS_H_INCLUDED */')
-
-	f = open(opts.out_header, 'wb')
-	f.write(genc.getString())
-	f.close()
+	# genbuiltins for all byte order profiles; only the final packing of
+	# the init data is done separately for each byte order
+	gb = GenBuiltins(build_info = build_info, byte_orders=opts.byte_orders.split(','), ext_section_b=True, ext_browser_like=True)
 
+	gb.processBuiltins()
+	genc_src = dukutil.GenerateC()
+	genc_hdr = dukutil.GenerateC()
+	generateFiles(gb, genc_src, genc_hdr)
+	dukutil.write_file_if_changed(opts.out_source, genc_src.getBytes())
+	dukutil.write_file_if_changed(opts.out_header, genc_hdr.getBytes())
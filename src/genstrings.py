@@ -25,6 +25,8 @@
 #  XXX: improve per string metadata, and sort strings within constraints
 #  XXX: some Duktape internal strings could just reuse existing strings
 
+from __future__ import print_function
+
 import os, sys
 import optparse
 import dukutil
@@ -42,23 +44,27 @@ define_prefix = 'DUK_STRIDX_'
 # XXX: currently the keywords are not recorded; use them later to organize
 # strings more optimally
 
-class BuiltinString:
-	name = None
-	section_b = None
-	browser_like = None
-	custom = None
-	internal = None
-	reserved_word = None
-	future_reserved_word = None
-	future_reserved_word_strict = None
-	special_literal = None
-	class_name = None
-
-	# computed
-	req_8bit = None
+try:
+	_intern = sys.intern
+except AttributeError:
+	_intern = intern  # Python 2
 
-	def __init__(self):
-		pass
+class BuiltinString(object):
+	# There are several hundred string objects, so avoid a dict per
+	# instance.  Attributes are set by mkstr().
+	__slots__ = ('name', 'section_b', 'browser_like', 'custom', 'internal',
+	             'reserved_word', 'future_reserved_word', 'future_reserved_word_strict',
+	             'special_literal', 'class_name',
+	             'req_8bit')  # computed
+
+def internal_name(x):
+	"Get the string table form of an internal property name."
+
+	# A 0xff prefix (never part of valid UTF-8) is used for internal properties.
+	# It is encoded as 0x00 in generated init data for technical reasons: it
+	# keeps lookup table elements 7 bits instead of 8 bits.
+
+	return _intern('\x00' + x)
 
 def mkstr(x,
           section_b=False,
@@ -73,15 +79,11 @@ def mkstr(x,
 
 	"Create a string object."
 
-	# A 0xff prefix (never part of valid UTF-8) is used for internal properties.
-	# It is encoded as 0x00 in generated init data for technical reasons: it
-	# keeps lookup table elements 7 bits instead of 8 bits.
-
 	if internal:
-		x = '\x00' + x
+		x = internal_name(x)
 
 	ret = BuiltinString()
-	ret.name = x
+	ret.name = _intern(x)
 	ret.section_b = section_b
 	ret.browser_like = browser_like
 	ret.custom = custom
@@ -735,7 +737,7 @@ special_define_names = {
 # Get a define name for a string
 def get_define_name(x):
 	x = x.name
-	if special_define_names.has_key(x):
+	if x in special_define_names:
 		return define_prefix + special_define_names[x]
 
 	is_internal = False
@@ -853,10 +855,10 @@ def gen_strings_data_bitpacked(strlist):
 
 	res = be.getByteString()
 
-	print ('%d strings, %d bytes of string init data, %d maximum string length, ' + \
+	print(('%d strings, %d bytes of string init data, %d maximum string length, ' + \
 	       'encoding: optimal=%d,switch1=%d,switch=%d,sevenbit=%d') % \
 		(len(strlist), len(res), maxlen, \
-	         n_optimal, n_switch1, n_switch, n_sevenbit)
+	         n_optimal, n_switch1, n_switch, n_sevenbit))
 
 	return res, maxlen
 
@@ -934,7 +936,7 @@ def gen_string_list():
 
 	for lst in str_lists:
 		for i in lst:
-			if req_8bit.has_key(i.name):
+			if i.name in req_8bit:
 				continue
 			_add(i, False)
 
@@ -946,7 +948,7 @@ def gen_string_list():
 
 	for i,v in enumerate(strlist):
 		name, defname = v[0], v[1]
-		if req_8bit.has_key(name):
+		if name in req_8bit:
 			if i >= 256:
 				raise Exception('8-bit string index not satisfied: ' + repr(v))
 
@@ -990,10 +992,10 @@ class GenStrings:
 		return self.define_to_index[x]
 
 	def hasString(self, x):
-		return self.string_to_index.has_key(x)
+		return x in self.string_to_index
 
 	def hasDefine(self, x):
-		return self.define_to_index.has_key(x)
+		return x in self.define_to_index
 
 	def emitStringsData(self, genc):
 		genc.emitArray(self.strdata, 'duk_strings_data', typename='duk_uint8_t', intvalues=True, const=True)
@@ -1008,20 +1010,20 @@ class GenStrings:
 		genc.emitDefine('DUK_STRDATA_DATA_LENGTH', len(self.strdata))
 		genc.emitDefine('DUK_STRDATA_MAX_STRLEN', self.maxlen)
 		genc.emitLine('')
-		idx = 0
-		for s, d in self.strlist:
-			genc.emitDefine(d, idx, repr(s))
-			idx += 1
+		# These tables have a few lines per string, so build each table
+		# as a list of lines and emit it in one go.
+		fmt = genc.formatDefine
+		genc.emitLines([ fmt(d, idx, repr(s)) for idx, (s, d) in enumerate(self.strlist) ])
 		genc.emitLine('')
-		idx = 0
+		lines = []
 		for s, d in self.strlist:
 			defname = d.replace('_STRIDX','_HEAP_STRING')  # FIXME
-			genc.emitDefine(defname + '(heap)', 'DUK_HEAP_GET_STRING((heap),%s)' % d)
+			lines.append(fmt(defname + '(heap)', 'DUK_HEAP_GET_STRING((heap),%s)' % d))
 			defname = d.replace('_STRIDX', '_HTHREAD_STRING')
-			genc.emitDefine(defname + '(thr)', 'DUK_HTHREAD_GET_STRING((thr),%s)' % d)
-			idx += 1
+			lines.append(fmt(defname + '(thr)', 'DUK_HTHREAD_GET_STRING((thr),%s)' % d))
+		genc.emitLines(lines)
 		genc.emitLine('')
-		genc.emitDefine('DUK_HEAP_NUM_STRINGS', idx)
+		genc.emitDefine('DUK_HEAP_NUM_STRINGS', len(self.strlist))
 		genc.emitLine('')
 		genc.emitDefine('DUK_STRIDX_START_RESERVED', self.idx_start_reserved)
 		genc.emitDefine('DUK_STRIDX_START_STRICT_RESERVED', self.idx_start_strict_reserved)